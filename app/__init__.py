@@ -1,14 +1,22 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+import sqlite3
+import threading
+import time
 
-from flask import Flask
+from flask import Flask, Response
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from flask_login import LoginManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 from app.config import config, get_config
+from app.utils.json_utils import OrjsonProvider, dumps_bytes
 
 # Initialize Flask extensions
 db = SQLAlchemy()
@@ -16,13 +24,117 @@ login_manager = LoginManager()
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["10000 per day", "1000 per hour"],  # Higher limits for development
-    storage_uri="memory://"  # Will be overridden by config
+    # Storage comes from RATELIMIT_STORAGE_URI in config
+    strategy="fixed-window",  # Cheapest strategy - one counter per limit window
+    headers_enabled=False,  # Clients don't use X-RateLimit-* headers
+    swallow_errors=True,  # A storage outage must not take the app down
+    in_memory_fallback_enabled=True  # Fall back to memory if Redis is unreachable
 )
 
 
 # ==================== Dynamic Rate Limit Functions ====================
-# These functions return rate limit strings from database settings.
-# They are used as callables in @limiter.limit() decorators.
+# Rate limit strings are resolved from database settings in one pass and
+# stored on app.extensions['rate_limits']. The callables used in
+# @limiter.limit() decorators only read from that map, so a limited request
+# never touches the database. The map is refreshed when an admin changes a
+# rate limit setting, and otherwise every RATE_LIMIT_CACHE_TTL seconds so
+# other worker processes pick up the change. While rate limiting is disabled
+# a request filter exempts every request, so the limiter storage is skipped.
+
+RATE_LIMIT_CACHE_TTL = 60  # seconds
+
+# Returned when rate limiting is disabled - effectively unlimited
+DISABLED_RATE_LIMIT = "1000000 per hour"
+
+# Fallback limits used when the database is not available
+DEFAULT_RATE_LIMIT_STRINGS = {
+    'chat': '100 per hour',
+    'attachment_upload': '50 per hour',
+    'document_upload': '20 per hour',
+    'improve_prompt': '30 per hour',
+    'login': '10 per minute',
+    'register': '5 per hour',
+    '2fa': '10 per minute'
+}
+
+_rate_limit_refresh_lock = threading.Lock()
+
+
+def refresh_rate_limits(app):
+    """
+    Resolve all rate limit strings from AdminSettings and store them on the app.
+    Must be called inside an application context.
+
+    Args:
+        app: The Flask application
+
+    Returns:
+        dict: Limit names mapped to Flask-Limiter rate limit strings
+    """
+    from app.models.admin_settings import AdminSettings
+
+    try:
+        # One query for the toggle and every limit (just the toggle when disabled)
+        rate_limits = AdminSettings.get_all_rate_limit_strings()
+        enabled = rate_limits.pop('enabled')
+        if enabled:
+            limits = {
+                limit_name: rate_limits.get(limit_name, default)
+                for limit_name, default in DEFAULT_RATE_LIMIT_STRINGS.items()
+            }
+        else:
+            limits = dict.fromkeys(DEFAULT_RATE_LIMIT_STRINGS, DISABLED_RATE_LIMIT)
+    except Exception:
+        # Fallback to defaults if database not available
+        enabled = True
+        limits = dict(DEFAULT_RATE_LIMIT_STRINGS)
+
+    with _rate_limit_refresh_lock:
+        app.extensions['rate_limits'] = {
+            'enabled': enabled,
+            'limits': limits,
+            'timestamp': time.monotonic()
+        }
+    return limits
+
+
+def _get_rate_limit_state(app=None):
+    """Get the cached rate limit entry for the app, refreshing it if stale"""
+    from flask import current_app
+
+    if app is None:
+        app = current_app._get_current_object()
+
+    cached = app.extensions.get('rate_limits')
+    if cached is None or time.monotonic() - cached['timestamp'] >= RATE_LIMIT_CACHE_TTL:
+        refresh_rate_limits(app)
+        cached = app.extensions['rate_limits']
+    return cached
+
+
+def get_rate_limits(app=None):
+    """
+    Get the resolved rate limit strings for the app, refreshing them if stale.
+
+    Args:
+        app: The Flask application (defaults to current_app)
+
+    Returns:
+        dict: Limit names mapped to Flask-Limiter rate limit strings
+    """
+    return _get_rate_limit_state(app)['limits']
+
+
+@limiter.request_filter
+def rate_limiting_disabled():
+    """
+    Exempt every request from rate limiting while it is disabled in admin settings.
+
+    Returns:
+        bool: True if rate limiting is disabled
+    """
+    return not _get_rate_limit_state()['enabled']
+
 
 def get_dynamic_rate_limit(limit_name: str):
     """
@@ -35,26 +147,10 @@ def get_dynamic_rate_limit(limit_name: str):
     Returns:
         A callable that returns the rate limit string
     """
+    default = DEFAULT_RATE_LIMIT_STRINGS.get(limit_name, '100 per hour')
+
     def _get_limit():
-        from app.models.admin_settings import AdminSettings
-        try:
-            # Check if rate limiting is disabled
-            if not AdminSettings.is_rate_limit_enabled():
-                # Return a very high limit effectively disabling rate limiting
-                return "1000000 per hour"
-            return AdminSettings.get_rate_limit_string(limit_name)
-        except Exception:
-            # Fallback to defaults if database not available
-            defaults = {
-                'chat': '100 per hour',
-                'attachment_upload': '50 per hour',
-                'document_upload': '20 per hour',
-                'improve_prompt': '30 per hour',
-                'login': '10 per minute',
-                'register': '5 per hour',
-                '2fa': '10 per minute'
-            }
-            return defaults.get(limit_name, '100 per hour')
+        return get_rate_limits().get(limit_name, default)
     return _get_limit
 
 
@@ -84,17 +180,29 @@ def create_app(config_name=None):
     config_obj = get_config(config_name)
     app.config.from_object(config_obj)
 
+    # orjson-backed jsonify() / get_json()
+    app.json = OrjsonProvider(app)
+
     # Validate production config
     if config_name == 'production':
         config_obj.validate()
 
     # Initialize extensions
     db.init_app(app)
+    configure_sqlite(app)
     login_manager.init_app(app)
 
+    # Register every model before any query configures the mappers
+    # (relationships such as User.roles refer to other models by name, and
+    # the rate limit refresh below already queries AdminSettings)
+    from app.models import import_all_models
+    import_all_models()
+
     # Configure rate limiter only if enabled
     if app.config.get('RATELIMIT_ENABLED', True):
         limiter.init_app(app)
+        with app.app_context():
+            refresh_rate_limits(app)
 
     # Configure login manager
     login_manager.login_view = 'auth.login'
@@ -104,47 +212,29 @@ def create_app(config_name=None):
     # User loader for Flask-Login
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        return User.query.get(int(user_id))
+        from app.models.user import get_user
+
+        # Cached on g for the rest of the request; see get_user()
+        return get_user(user_id)
 
-    # Single session enforcement - validate session token on every request
+    # Endpoints on protected blueprints that never need session validation
+    # (public health checks). Checked before current_user is touched so these
+    # requests skip the user load entirely.
+    app.config['SESSION_VALIDATION_EXEMPT'] = frozenset({
+        'main.health',
+        'main.status'
+    })
+
+    # Classify the request once so the session check and error handlers
+    # don't repeat the same prefix check
     @app.before_request
-    def validate_session_token():
-        from flask import session, request, redirect, url_for, jsonify
-        from flask_login import current_user, logout_user
-
-        # Skip validation for unauthenticated users
-        if not current_user.is_authenticated:
-            return
-
-        # Skip validation for auth routes (login, logout, register, etc.)
-        # to prevent redirect loops
-        if request.endpoint and (
-            request.endpoint.startswith('auth.') or
-            request.endpoint == 'static'
-        ):
-            return
-
-        # Get session token from Flask session
-        stored_token = session.get('session_token')
-
-        # Validate token against database
-        if not current_user.validate_session_token(stored_token):
-            # Token mismatch - another device logged in
-            # Clear the session
-            session.clear()
-            logout_user()
-
-            # Return appropriate response based on request type
-            if request.is_json or request.path.startswith('/api/'):
-                return jsonify({
-                    'error': 'Session invalidated - logged in from another device',
-                    'code': 'SESSION_INVALIDATED',
-                    'redirect': url_for('auth.login')
-                }), 401
-
-            # Redirect to login for regular requests
-            return redirect(url_for('auth.login'))
+    def classify_request():
+        from flask import g, request
+
+        g.is_api = request.path.startswith('/api/')
+
+    # Single session enforcement is registered per blueprint
+    # (see app.utils.auth.validate_session_token)
 
     # Register blueprints
     register_blueprints(app)
@@ -163,63 +253,137 @@ def create_app(config_name=None):
     return app
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply performance PRAGMAs to each new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a write is in progress
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # NORMAL is durable in WAL mode and avoids an fsync per transaction
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')  # 256 MB
+    cursor.execute('PRAGMA cache_size=-64000')  # 64 MB
+    cursor.close()
+
+
+def configure_sqlite(app):
+    """Enable WAL mode and PRAGMA tuning when using the SQLite backend"""
+
+    if not app.config.get('SQLALCHEMY_DATABASE_URI', '').startswith('sqlite'):
+        return
+
+    if not event.contains(Engine, 'connect', _set_sqlite_pragmas):
+        event.listen(Engine, 'connect', _set_sqlite_pragmas)
+
+
 def register_blueprints(app):
     """Register Flask blueprints"""
 
-    # Import and register blueprints here to avoid circular imports
-    from app.routes.auth import bp as auth_bp
-    from app.routes.chat import bp as chat_bp
-    from app.routes.main import bp as main_bp
+    # Imported here rather than at module top to avoid circular imports
+    # (route modules import db and limiter from this package)
+    from app.blueprints import auth_bp, chat_bp, main_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(chat_bp, url_prefix='/api')
 
 
+# Error responses: {status code: (JSON body for /api/ requests, HTML body otherwise)}
+_ERROR_RESPONSES = {
+    400: (
+        {'error': 'Bad request'},
+        '<h1>400 Bad Request</h1><p>The request could not be understood by the server.</p>'
+    ),
+    401: (
+        {'error': 'Unauthorized'},
+        '<h1>401 Unauthorized</h1><p>You need to log in to access this page.</p>'
+    ),
+    403: (
+        {'error': 'Forbidden'},
+        '<h1>403 Forbidden</h1><p>You do not have permission to access this resource.</p>'
+    ),
+    404: (
+        {'error': 'Not found'},
+        '<h1>404 Not Found</h1><p>The requested resource was not found.</p>'
+    ),
+    429: (
+        {
+            'error': 'Rate limit exceeded. Please slow down and try again later.',
+            'code': 'RATE_LIMIT_EXCEEDED'
+        },
+        '<h1>429 Too Many Requests</h1><p>You have exceeded the rate limit. Please slow down and try again later.</p>'
+    ),
+    500: (
+        {'error': 'Internal server error'},
+        '<h1>500 Internal Server Error</h1><p>An error occurred while processing your request.</p>'
+    ),
+}
+
+
+def _is_api_request() -> bool:
+    """
+    Check whether the current request targets the JSON API.
+    Uses the flag set by classify_request, falling back to the path when the
+    error was raised before that hook ran (e.g. by the rate limiter).
+    """
+    from flask import g, request
+
+    is_api = g.get('is_api')
+    if is_api is None:
+        is_api = request.path.startswith('/api/')
+    return is_api
+
+
+# Error bodies pre-encoded once at import: {status code: (JSON bytes, HTML bytes)}
+_ERROR_BODIES = {
+    code: (dumps_bytes(json_body), html_body.encode('utf-8'))
+    for code, (json_body, html_body) in _ERROR_RESPONSES.items()
+}
+
+
+def _make_error_handler(app, code):
+    """Build the error handler for a status code from _ERROR_BODIES"""
+
+    json_bytes, html_bytes = _ERROR_BODIES[code]
+
+    def handle_error(error):
+        if code == 500:
+            app.logger.error(f'Internal server error: {error}')
+        if _is_api_request():
+            return Response(json_bytes, status=code, mimetype='application/json')
+        return Response(html_bytes, status=code, mimetype='text/html')
+
+    return handle_error
+
+
 def register_error_handlers(app):
     """Register error handlers"""
 
-    from flask import jsonify, request
-
-    @app.errorhandler(400)
-    def bad_request(error):
-        if request.path.startswith('/api/'):
-            return jsonify({'error': 'Bad request'}), 400
-        return '<h1>400 Bad Request</h1><p>The request could not be understood by the server.</p>', 400
-
-    @app.errorhandler(401)
-    def unauthorized(error):
-        if request.path.startswith('/api/'):
-            return jsonify({'error': 'Unauthorized'}), 401
-        return '<h1>401 Unauthorized</h1><p>You need to log in to access this page.</p>', 401
-
-    @app.errorhandler(403)
-    def forbidden(error):
-        if request.path.startswith('/api/'):
-            return jsonify({'error': 'Forbidden'}), 403
-        return '<h1>403 Forbidden</h1><p>You do not have permission to access this resource.</p>', 403
-
-    @app.errorhandler(404)
-    def not_found(error):
-        if request.path.startswith('/api/'):
-            return jsonify({'error': 'Not found'}), 404
-        return '<h1>404 Not Found</h1><p>The requested resource was not found.</p>', 404
-
-    @app.errorhandler(429)
-    def rate_limit_exceeded(error):
-        if request.path.startswith('/api/'):
-            return jsonify({
-                'error': 'Rate limit exceeded. Please slow down and try again later.',
-                'code': 'RATE_LIMIT_EXCEEDED'
-            }), 429
-        return '<h1>429 Too Many Requests</h1><p>You have exceeded the rate limit. Please slow down and try again later.</p>', 429
-
-    @app.errorhandler(500)
-    def internal_server_error(error):
-        app.logger.error(f'Internal server error: {error}')
-        if request.path.startswith('/api/'):
-            return jsonify({'error': 'Internal server error'}), 500
-        return '<h1>500 Internal Server Error</h1><p>An error occurred while processing your request.</p>', 500
+    for code in _ERROR_RESPONSES:
+        app.register_error_handler(code, _make_error_handler(app, code))
+
+
+class SampledRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that only checks the file size every
+    ROLLOVER_CHECK_INTERVAL records instead of on every emit.
+    The log file may overshoot maxBytes by at most that many records.
+    """
+
+    ROLLOVER_CHECK_INTERVAL = 1024  # must be a power of two
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._emit_count = 0
+
+    def shouldRollover(self, record):
+        self._emit_count += 1
+        if self._emit_count & (self.ROLLOVER_CHECK_INTERVAL - 1):
+            return 0
+        return super().shouldRollover(record)
 
 
 def configure_logging(app):
@@ -231,7 +395,7 @@ def configure_logging(app):
             os.mkdir('logs')
 
         # Set up file handler with rotation
-        file_handler = RotatingFileHandler(
+        file_handler = SampledRotatingFileHandler(
             app.config.get('LOG_FILE', 'logs/app.log'),
             maxBytes=10240000,  # 10MB
             backupCount=10
@@ -246,7 +410,16 @@ def configure_logging(app):
         # Set log level
         log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'))
         file_handler.setLevel(log_level)
-        app.logger.addHandler(file_handler)
+
+        # Request threads only enqueue records; a background listener
+        # thread does the file writes and rotation
+        log_queue = queue.Queue(-1)
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        app.extensions['log_listener'] = listener
+
+        app.logger.addHandler(QueueHandler(log_queue))
         app.logger.setLevel(log_level)
 
         app.logger.info('Application startup')
@@ -0,0 +1,18 @@
+"""
+Blueprint registry.
+
+Imports every route module at module load so that importing this module
+(e.g. from create_app in a gunicorn --preload parent) pays the route and
+service import cost once, before workers fork. Kept separate from
+app/__init__.py because the route modules import db/limiter from there.
+"""
+from app.models import import_all_models
+
+# Route modules use models whose relationships refer to each other by name
+import_all_models()
+
+from app.routes.auth import bp as auth_bp  # noqa: E402
+from app.routes.chat import bp as chat_bp  # noqa: E402
+from app.routes.main import bp as main_bp  # noqa: E402
+
+__all__ = ['auth_bp', 'chat_bp', 'main_bp']
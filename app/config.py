@@ -28,6 +28,28 @@ def get_database_url():
         return os.getenv('DATABASE_URL', 'sqlite:///simplyai.db')
 
 
+def get_engine_options(database_url):
+    """
+    Get SQLAlchemy engine options tuned for the given database URL.
+
+    Server databases (SQL Server Express etc.) get a larger connection pool
+    with pre-ping so stale connections are replaced instead of failing a request.
+    SQLite keeps Flask-SQLAlchemy's defaults (it already uses StaticPool for
+    in-memory databases) but allows connections to be shared across threads.
+    """
+    if database_url.startswith('sqlite'):
+        return {
+            'connect_args': {'check_same_thread': False}
+        }
+
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))
+    }
+
+
 class Config:
     """Base configuration"""
 
@@ -44,8 +66,24 @@ class Config:
     SESSION_COOKIE_HTTPONLY = os.getenv('SESSION_COOKIE_HTTPONLY', 'True') == 'True'
     SESSION_COOKIE_SAMESITE = 'Lax'
 
-    # Rate limiting (uses in-memory storage - sufficient for single-instance home edition)
-    RATELIMIT_STORAGE_URL = 'memory://'
+    # Password hashing (argon2id cost; used when argon2-cffi is installed).
+    # Memory cost is in KiB. Existing hashes are upgraded on next login.
+    PASSWORD_HASH_TIME_COST = int(os.getenv('PASSWORD_HASH_TIME_COST', 2))
+    PASSWORD_HASH_MEMORY_COST = int(os.getenv('PASSWORD_HASH_MEMORY_COST', 64 * 1024))
+    PASSWORD_HASH_PARALLELISM = int(os.getenv('PASSWORD_HASH_PARALLELISM', 1))
+    # Concurrent hashes per process, and how long (seconds) a request waits
+    # for a free slot before getting a 503
+    PASSWORD_HASH_MAX_CONCURRENCY = int(os.getenv('PASSWORD_HASH_MAX_CONCURRENCY', os.cpu_count() or 1))
+    PASSWORD_HASH_WAIT_TIMEOUT = float(os.getenv('PASSWORD_HASH_WAIT_TIMEOUT', 5))
+
+    # Make the per-request user load raise on lazy loads of relationships not
+    # listed in app.models.user.USER_LAZY_RELATIONSHIPS (see get_user), so new
+    # per-request N+1 queries show up as errors in tests
+    RAISELOAD_CURRENT_USER = False
+
+    # Rate limiting (in-memory storage is sufficient for a single-instance home edition;
+    # set REDIS_URL to share limits across multiple worker processes)
+    RATELIMIT_STORAGE_URI = os.getenv('REDIS_URL', 'memory://')
     RATELIMIT_ENABLED = True
 
     # AI Provider Configuration
@@ -77,11 +115,12 @@ class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = False
     SQLALCHEMY_DATABASE_URI = get_database_url()
-    # Log SQL queries in development (can be disabled via SQLALCHEMY_ECHO=false env var)
-    SQLALCHEMY_ECHO = os.getenv('SQLALCHEMY_ECHO', 'true').lower() == 'true'
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(SQLALCHEMY_DATABASE_URI)
+    # Log SQL queries in development (opt-in via SQLALCHEMY_ECHO=true env var;
+    # echo formats and prints every statement, which dominates small queries)
+    SQLALCHEMY_ECHO = os.getenv('SQLALCHEMY_ECHO', 'false').lower() == 'true'
 
-    # Rate limiting enabled with memory storage
-    RATELIMIT_STORAGE_URL = 'memory://'
+    # Rate limiting enabled (memory storage unless REDIS_URL is set)
     RATELIMIT_ENABLED = True
 
 
@@ -90,8 +129,10 @@ class TestingConfig(Config):
     DEBUG = False
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite:///test.db')
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(SQLALCHEMY_DATABASE_URI)
     WTF_CSRF_ENABLED = False
     RATELIMIT_ENABLED = False
+    RAISELOAD_CURRENT_USER = True
 
 
 class ProductionConfig(Config):
@@ -99,6 +140,7 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SQLALCHEMY_DATABASE_URI = get_database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(SQLALCHEMY_DATABASE_URI)
     SESSION_COOKIE_SECURE = True  # Force HTTPS in production
 
     # Ensure critical settings are set in production
@@ -1,13 +1,49 @@
-from app.models.user import User
-from app.models.chat import Chat, Message
-from app.models.attachment import Attachment
-from app.models.password_history import PasswordHistory
-from app.models.twofa_backup import TwoFABackupCode
-from app.models.pending_2fa import Pending2FAVerification
-from app.models.rbac import Role, Permission
-from app.models.user_settings import UserSettings
-from app.models.model_visibility import ModelVisibility
-from app.models.admin_settings import AdminSettings
-from app.models.document import Document, DocumentChunk
+"""
+Model registry.
+
+Models are resolved lazily on attribute access (PEP 562) so that importing
+``app.models`` does not pull in every model module. Code that needs every
+table registered with SQLAlchemy (create_all, mapper configuration for
+string-based relationships) should call ``import_all_models()`` first.
+"""
+import importlib
+
+# Maps each exported model name to the module that defines it
+_MODULE_MAP = {
+    'User': 'app.models.user',
+    'Chat': 'app.models.chat',
+    'Message': 'app.models.chat',
+    'Attachment': 'app.models.attachment',
+    'PasswordHistory': 'app.models.password_history',
+    'TwoFABackupCode': 'app.models.twofa_backup',
+    'Pending2FAVerification': 'app.models.pending_2fa',
+    'Role': 'app.models.rbac',
+    'Permission': 'app.models.rbac',
+    'UserSettings': 'app.models.user_settings',
+    'ModelVisibility': 'app.models.model_visibility',
+    'AdminSettings': 'app.models.admin_settings',
+    'Document': 'app.models.document',
+    'DocumentChunk': 'app.models.document',
+}
 
 __all__ = ['User', 'Chat', 'Message', 'Attachment', 'PasswordHistory', 'TwoFABackupCode', 'Pending2FAVerification', 'Role', 'Permission', 'UserSettings', 'ModelVisibility', 'AdminSettings', 'Document', 'DocumentChunk']
+
+
+def __getattr__(name):
+    module_name = _MODULE_MAP.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+def import_all_models():
+    """Import every model module so all tables and relationships are registered"""
+    for module_name in dict.fromkeys(_MODULE_MAP.values()):
+        importlib.import_module(module_name)
@@ -1,7 +1,25 @@
 """Admin Settings Configuration"""
 
 from app import db
-from datetime import datetime
+from app.utils.db_types import utcnow
+from app.utils import json_utils
+from sqlalchemy import select
+import json
+import threading
+import time
+
+# String values treated as True for boolean settings
+_BOOL_TRUE = frozenset({'true', '1', 'yes', 'on', 't', 'y'})
+
+# Provider groups, in display order (tuples) and for membership checks (frozensets)
+_CLOUD_PROVIDER_ORDER = ('gemini', 'openai', 'anthropic', 'xai')
+_LOCAL_PROVIDER_ORDER = ('lm_studio', 'ollama')
+_LOCAL_PROVIDERS = frozenset(_LOCAL_PROVIDER_ORDER)
+
+# Marker stored in the settings cache for keys that have no row
+_MISSING = object()
+
+_settings_cache_lock = threading.Lock()
 
 
 class AdminSettings(db.Model):
@@ -18,8 +36,18 @@ class AdminSettings(db.Model):
     setting_type = db.Column(db.String(20), default='string', nullable=False)  # string, boolean, integer, json
     description = db.Column(db.Text, nullable=True)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), nullable=False)
+    updated_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), onupdate=utcnow(), nullable=False)
+
+    # In-process cache of typed setting values, shared by all requests in this worker
+    # Structure: {setting_key: (timestamp, typed_value or _MISSING)}
+    _settings_cache = {}
+    SETTINGS_CACHE_TTL = 60  # seconds
+
+    # Primary key of each setting row seen so far, so repeat lookups by key
+    # can be served from the session identity map via db.session.get()
+    # Structure: {setting_key: id}
+    _key_to_pk = {}
 
     def __repr__(self):
         return f'<AdminSettings {self.setting_key}: {self.setting_value}>'
@@ -35,21 +63,36 @@ class AdminSettings(db.Model):
         }
 
     def get_typed_value(self):
-        """Get the setting value cast to the appropriate type"""
+        """
+        Get the setting value cast to the appropriate type.
+
+        The parsed value is kept on the instance and reused until
+        setting_value or setting_type changes, so JSON settings are only
+        decoded once per loaded row.
+        """
+        cached = getattr(self, '_typed_cache', None)
+        if cached is not None and cached[0] == self.setting_type and cached[1] is self.setting_value:
+            return cached[2]
+
+        value = self._parse_value()
+        self._typed_cache = (self.setting_type, self.setting_value, value)
+        return value
+
+    def _parse_value(self):
+        """Cast the raw setting_value string to its setting_type"""
         if self.setting_value is None:
             return None
 
         if self.setting_type == 'boolean':
-            return self.setting_value.lower() in ('true', '1', 'yes', 'on')
+            return self.setting_value.strip().lower() in _BOOL_TRUE
         elif self.setting_type == 'integer':
             try:
                 return int(self.setting_value)
             except (ValueError, TypeError):
                 return 0
         elif self.setting_type == 'json':
-            import json
             try:
-                return json.loads(self.setting_value)
+                return json_utils.loads(self.setting_value)
             except (json.JSONDecodeError, TypeError):
                 return {}
         else:  # string
@@ -62,11 +105,14 @@ class AdminSettings(db.Model):
         elif self.setting_type == 'integer':
             self.setting_value = str(value)
         elif self.setting_type == 'json':
-            import json
-            self.setting_value = json.dumps(value)
+            self.setting_value = json_utils.dumps(value)
         else:  # string
             self.setting_value = str(value) if value is not None else None
 
+        # Dropped rather than primed with value: e.g. booleans and integers
+        # are normalised by the round trip through the string form
+        self._typed_cache = None
+
     @staticmethod
     def initialize_default_settings():
         """
@@ -106,10 +152,55 @@ class AdminSettings(db.Model):
             db.session.rollback()
             raise e
 
+        AdminSettings.clear_cache()
+
+    @staticmethod
+    def clear_cache(key=None):
+        """
+        Drop cached setting values so the next read goes to the database.
+
+        Args:
+            key: The setting key to drop, or None to clear the whole cache
+        """
+        with _settings_cache_lock:
+            if key is None:
+                AdminSettings._settings_cache.clear()
+            else:
+                AdminSettings._settings_cache.pop(key, None)
+
+    @staticmethod
+    def get_by_key(key):
+        """
+        Load the AdminSettings row for a key.
+        Rows already loaded in this session are returned from the identity
+        map without a query.
+
+        Args:
+            key: The setting key
+
+        Returns:
+            AdminSettings or None
+        """
+        pk = AdminSettings._key_to_pk.get(key)
+        if pk is not None:
+            setting = db.session.get(AdminSettings, pk)
+            # The row may have been deleted, or its id reused for another key
+            if setting is not None and setting.setting_key == key:
+                return setting
+            AdminSettings._key_to_pk.pop(key, None)
+
+        setting = db.session.execute(
+            select(AdminSettings).where(AdminSettings.setting_key == key)
+        ).scalar_one_or_none()
+        if setting is not None:
+            AdminSettings._key_to_pk[key] = setting.id
+        return setting
+
     @staticmethod
     def get_setting(key, default=None):
         """
         Get a setting value by key.
+        Values are cached in-process for SETTINGS_CACHE_TTL seconds.
 
         Args:
             key: The setting key
@@ -118,10 +209,59 @@ class AdminSettings(db.Model):
         Returns:
             The typed setting value or default
         """
-        setting = AdminSettings.query.filter_by(setting_key=key).first()
-        if setting:
-            return setting.get_typed_value()
-        return default
+        now = time.monotonic()
+        entry = AdminSettings._settings_cache.get(key)
+        if entry is not None and now - entry[0] < AdminSettings.SETTINGS_CACHE_TTL:
+            value = entry[1]
+            return default if value is _MISSING else value
+
+        setting = AdminSettings.get_by_key(key)
+        value = setting.get_typed_value() if setting else _MISSING
+
+        with _settings_cache_lock:
+            AdminSettings._settings_cache[key] = (now, value)
+
+        return default if value is _MISSING else value
+
+    @staticmethod
+    def get_settings_bulk(keys) -> dict:
+        """
+        Get several settings at once.
+        Cached values are reused; the rest are loaded with a single IN (...) query.
+
+        Args:
+            keys: Iterable of setting keys
+
+        Returns:
+            dict: Setting keys mapped to typed values (keys with no row are omitted)
+        """
+        now = time.monotonic()
+        result = {}
+        to_fetch = []
+
+        for key in keys:
+            entry = AdminSettings._settings_cache.get(key)
+            if entry is not None and now - entry[0] < AdminSettings.SETTINGS_CACHE_TTL:
+                if entry[1] is not _MISSING:
+                    result[key] = entry[1]
+            else:
+                to_fetch.append(key)
+
+        if to_fetch:
+            rows = db.session.execute(
+                select(AdminSettings).where(AdminSettings.setting_key.in_(to_fetch))
+            ).scalars().all()
+            fetched = {}
+            for row in rows:
+                AdminSettings._key_to_pk[row.setting_key] = row.id
+                fetched[row.setting_key] = row.get_typed_value()
+            result.update(fetched)
+
+            with _settings_cache_lock:
+                for key in to_fetch:
+                    AdminSettings._settings_cache[key] = (now, fetched.get(key, _MISSING))
+
+        return result
 
     @staticmethod
     def set_setting(key, value, setting_type='string', description=None):
@@ -137,7 +277,7 @@ class AdminSettings(db.Model):
         Returns:
             The AdminSettings object
         """
-        setting = AdminSettings.query.filter_by(setting_key=key).first()
+        setting = AdminSettings.get_by_key(key)
 
         if not setting:
             setting = AdminSettings(
@@ -153,8 +293,63 @@ class AdminSettings(db.Model):
             setting.description = description
 
         db.session.commit()
+        AdminSettings.clear_cache(key)
         return setting
 
+    @staticmethod
+    def set_settings_bulk(items, setting_type='string', setting_types=None, descriptions=None):
+        """
+        Set several settings with one SELECT and a single commit.
+
+        Args:
+            items: Dict of setting key -> value
+            setting_type: Type used for settings that do not exist yet
+            setting_types: Optional dict of setting key -> type overriding setting_type
+            descriptions: Optional dict of setting key -> description
+
+        Returns:
+            dict: Setting key -> AdminSettings object
+        """
+        if not items:
+            return {}
+
+        setting_types = setting_types or {}
+        descriptions = descriptions or {}
+
+        existing = {
+            setting.setting_key: setting
+            for setting in db.session.execute(
+                select(AdminSettings).where(AdminSettings.setting_key.in_(list(items)))
+            ).scalars()
+        }
+
+        for key, value in items.items():
+            setting = existing.get(key)
+            if not setting:
+                setting = AdminSettings(
+                    setting_key=key,
+                    setting_type=setting_types.get(key, setting_type),
+                    description=descriptions.get(key)
+                )
+                db.session.add(setting)
+                existing[key] = setting
+
+            setting.set_typed_value(value)
+
+            if descriptions.get(key):
+                setting.description = descriptions[key]
+
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            for key in items:
+                AdminSettings.clear_cache(key)
+
+        return existing
+
     @staticmethod
     def is_sensitive_info_filter_enabled():
         """
@@ -279,7 +474,7 @@ class AdminSettings(db.Model):
     # These are admin-level model IDs that define which models to use for each provider.
     # Stored as plain text (not encrypted) in the database.
 
-    SUPPORTED_MODEL_PROVIDERS = ['gemini', 'openai', 'anthropic', 'xai', 'lm_studio', 'ollama']
+    SUPPORTED_MODEL_PROVIDERS = frozenset(_CLOUD_PROVIDER_ORDER + _LOCAL_PROVIDER_ORDER)
 
     # Default model IDs (used when no setting exists in database)
     # Keep these in sync with scripts/migrations/add_model_id_settings.py
@@ -361,7 +556,7 @@ class AdminSettings(db.Model):
         Returns:
             str: URL, or default if not set
         """
-        if provider not in ['lm_studio', 'ollama']:
+        if provider not in _LOCAL_PROVIDERS:
             return ''
 
         setting_key = f'system_model_url_{provider}'
@@ -384,7 +579,7 @@ class AdminSettings(db.Model):
         Returns:
             bool: True if successful, False otherwise
         """
-        if provider not in ['lm_studio', 'ollama']:
+        if provider not in _LOCAL_PROVIDERS:
             return False
 
         setting_key = f'system_model_url_{provider}'
@@ -408,16 +603,34 @@ class AdminSettings(db.Model):
         Returns:
             dict: All model settings
         """
+        cloud_providers = _CLOUD_PROVIDER_ORDER
+        local_providers = _LOCAL_PROVIDER_ORDER
+
+        # Load every model ID and URL setting in one query
+        settings = AdminSettings.get_settings_bulk(
+            [f'system_model_id_{provider}' for provider in cloud_providers + local_providers] +
+            [f'system_model_url_{provider}' for provider in local_providers]
+        )
+
+        def model_id(provider):
+            value = settings.get(f'system_model_id_{provider}')
+            if value is None:
+                return AdminSettings.DEFAULT_MODEL_IDS.get(provider, '')
+            return value
+
         result = {}
 
         # Cloud provider model IDs
-        for provider in ['gemini', 'openai', 'anthropic', 'xai']:
-            result[f'{provider}_model_id'] = AdminSettings.get_system_model_id(provider)
+        for provider in cloud_providers:
+            result[f'{provider}_model_id'] = model_id(provider)
 
         # Local model settings
-        for provider in ['lm_studio', 'ollama']:
-            result[f'{provider}_model_id'] = AdminSettings.get_system_model_id(provider)
-            result[f'{provider}_url'] = AdminSettings.get_local_model_url(provider)
+        for provider in local_providers:
+            result[f'{provider}_model_id'] = model_id(provider)
+            url = settings.get(f'system_model_url_{provider}')
+            if url is None:
+                url = AdminSettings.DEFAULT_LOCAL_URLS.get(provider, '')
+            result[f'{provider}_url'] = url
 
         return result
 
@@ -425,7 +638,14 @@ class AdminSettings(db.Model):
     # These are admin-level API keys that all users share by default.
     # Users can optionally override with their own keys in their profile.
 
-    SUPPORTED_PROVIDERS = ['gemini', 'openai', 'anthropic', 'xai']
+    SUPPORTED_PROVIDERS = frozenset(_CLOUD_PROVIDER_ORDER)
+
+    # Characters of each key kept in its stored mask (system_api_key_mask_<provider>)
+    API_KEY_MASK_CHARS = 8
+
+    # Decrypted system API keys
+    # Structure: {provider: (ciphertext, plaintext)}
+    _api_key_cache = {}
 
     @staticmethod
     def get_system_api_key(provider: str) -> str:
@@ -438,22 +658,37 @@ class AdminSettings(db.Model):
         Returns:
             str: Decrypted API key, or empty string if not set
         """
-        from app.services.encryption_service import EncryptionService
-
         if provider not in AdminSettings.SUPPORTED_PROVIDERS:
             return ''
 
         setting_key = f'system_api_key_{provider}'
         encrypted_key = AdminSettings.get_setting(setting_key, default='')
+        return AdminSettings._decrypt_api_key(provider, encrypted_key)
+
+    @staticmethod
+    def _decrypt_api_key(provider: str, encrypted_key: str) -> str:
+        """
+        Decrypt a stored system API key, returning '' if empty or undecryptable.
+        The plaintext is cached per provider and reused while the stored
+        ciphertext is unchanged, so Fernet only runs when the key changes.
+        """
+        from app.services.encryption_service import EncryptionService
 
         if not encrypted_key:
             return ''
 
+        cached = AdminSettings._api_key_cache.get(provider)
+        if cached is not None and cached[0] == encrypted_key:
+            return cached[1]
+
         try:
-            return EncryptionService.decrypt(encrypted_key)
+            api_key = EncryptionService.decrypt(encrypted_key)
         except Exception:
             return ''
 
+        AdminSettings._api_key_cache[provider] = (encrypted_key, api_key)
+        return api_key
+
     @staticmethod
     def set_system_api_key(provider: str, api_key: str) -> bool:
         """
@@ -472,22 +707,36 @@ class AdminSettings(db.Model):
             return False
 
         setting_key = f'system_api_key_{provider}'
+        mask_key = f'system_api_key_mask_{provider}'
+        AdminSettings._api_key_cache.pop(provider, None)
 
-        # If empty key, remove the setting
+        # If empty key, remove the setting and its mask
         if not api_key:
-            setting = AdminSettings.query.filter_by(setting_key=setting_key).first()
-            if setting:
-                db.session.delete(setting)
+            deleted = False
+            for key in (setting_key, mask_key):
+                setting = AdminSettings.get_by_key(key)
+                if setting:
+                    db.session.delete(setting)
+                    deleted = True
+            if deleted:
                 db.session.commit()
+                AdminSettings.clear_cache(setting_key)
+                AdminSettings.clear_cache(mask_key)
             return True
 
         try:
             encrypted_key = EncryptionService.encrypt(api_key)
-            AdminSettings.set_setting(
-                key=setting_key,
-                value=encrypted_key,
-                setting_type='string',
-                description=f'Encrypted system API key for {provider}'
+            # The masked prefix is stored in plain text next to the key so
+            # status views never have to decrypt it
+            AdminSettings.set_settings_bulk(
+                {
+                    setting_key: encrypted_key,
+                    mask_key: EncryptionService.mask_api_key(api_key, AdminSettings.API_KEY_MASK_CHARS)
+                },
+                descriptions={
+                    setting_key: f'Encrypted system API key for {provider}',
+                    mask_key: f'Masked system API key for {provider} (display only)'
+                }
             )
             return True
         except Exception:
@@ -525,6 +774,20 @@ class AdminSettings(db.Model):
         """
         from app.services.encryption_service import EncryptionService
 
+        if provider not in AdminSettings.SUPPORTED_PROVIDERS:
+            return ''
+
+        if show_chars == AdminSettings.API_KEY_MASK_CHARS:
+            settings = AdminSettings.get_settings_bulk(
+                [f'system_api_key_{provider}', f'system_api_key_mask_{provider}']
+            )
+            if not settings.get(f'system_api_key_{provider}'):
+                return ''
+            masked_key = settings.get(f'system_api_key_mask_{provider}')
+            if masked_key is not None:
+                return masked_key
+
+        # Other widths, or keys saved before masks were stored
         api_key = AdminSettings.get_system_api_key(provider)
         if not api_key:
             return ''
@@ -539,13 +802,30 @@ class AdminSettings(db.Model):
         Returns:
             dict: Provider names mapped to their configuration status
         """
-        return {
-            provider: {
-                'configured': AdminSettings.has_system_api_key(provider),
-                'masked_key': AdminSettings.get_masked_system_api_key(provider)
+        from app.services.encryption_service import EncryptionService
+
+        # Load every provider's key and stored mask in one query
+        keys = []
+        for provider in _CLOUD_PROVIDER_ORDER:
+            keys.append(f'system_api_key_{provider}')
+            keys.append(f'system_api_key_mask_{provider}')
+        settings = AdminSettings.get_settings_bulk(keys)
+
+        status = {}
+        for provider in _CLOUD_PROVIDER_ORDER:
+            encrypted_key = settings.get(f'system_api_key_{provider}', '')
+            masked_key = ''
+            if encrypted_key:
+                masked_key = settings.get(f'system_api_key_mask_{provider}')
+                if masked_key is None:
+                    # Key saved before masks were stored - decrypt to mask it
+                    api_key = AdminSettings._decrypt_api_key(provider, encrypted_key)
+                    masked_key = EncryptionService.mask_api_key(api_key) if api_key else ''
+            status[provider] = {
+                'configured': bool(encrypted_key),
+                'masked_key': masked_key
             }
-            for provider in AdminSettings.SUPPORTED_PROVIDERS
-        }
+        return status
 
     # ==================== Rate Limit Settings ====================
     # These settings allow admins to customize rate limits for various endpoints.
@@ -632,12 +912,19 @@ class AdminSettings(db.Model):
         Returns:
             dict: All rate limit settings including enabled status
         """
+        # Load the toggle and every limit in one query
+        settings = AdminSettings.get_settings_bulk(
+            ['rate_limit_enabled'] +
+            [f'rate_limit_{limit_name}' for limit_name in AdminSettings.DEFAULT_RATE_LIMITS]
+        )
+
         result = {
-            'enabled': AdminSettings.is_rate_limit_enabled()
+            'enabled': settings.get('rate_limit_enabled', True)
         }
 
-        for limit_name in AdminSettings.DEFAULT_RATE_LIMITS.keys():
-            result[limit_name] = AdminSettings.get_rate_limit(limit_name)
+        for limit_name, default in AdminSettings.DEFAULT_RATE_LIMITS.items():
+            value = settings.get(f'rate_limit_{limit_name}')
+            result[limit_name] = int(value) if value else default
 
         return result
 
@@ -652,10 +939,46 @@ class AdminSettings(db.Model):
         Returns:
             str: Rate limit string (e.g., "100 per hour", "10 per minute")
         """
-        value = AdminSettings.get_rate_limit(limit_name)
+        return AdminSettings.format_rate_limit_string(
+            limit_name, AdminSettings.get_rate_limit(limit_name)
+        )
+
+    @staticmethod
+    def format_rate_limit_string(limit_name: str, value: int) -> str:
+        """
+        Format a rate limit value as a Flask-Limiter compatible string.
 
+        Args:
+            limit_name: Name of the rate limit
+            value: The rate limit value
+
+        Returns:
+            str: Rate limit string (e.g., "100 per hour", "10 per minute")
+        """
         # Login and 2FA are per minute, others are per hour
         if limit_name in ('login', '2fa'):
             return f"{value} per minute"
         else:
             return f"{value} per hour"
+
+    @staticmethod
+    def get_all_rate_limit_strings() -> dict:
+        """
+        Get every rate limit as a Flask-Limiter compatible string.
+        Uses get_all_rate_limits, so all values come from one (cached) query.
+        When rate limiting is disabled only the toggle is read.
+
+        Returns:
+            dict: 'enabled' plus limit names mapped to rate limit strings
+                  (just {'enabled': False} when disabled)
+        """
+        if not AdminSettings.is_rate_limit_enabled():
+            return {'enabled': False}
+
+        rate_limits = AdminSettings.get_all_rate_limits()
+        result = {'enabled': rate_limits['enabled']}
+        for limit_name in AdminSettings.DEFAULT_RATE_LIMITS:
+            result[limit_name] = AdminSettings.format_rate_limit_string(
+                limit_name, rate_limits[limit_name]
+            )
+        return result
@@ -2,8 +2,26 @@
 Attachment model for file attachments in chat messages.
 Supports images, PDFs, and other document types.
 """
-from datetime import datetime
 from app import db
+from app.utils.db_types import utcnow
+from app.utils.json_utils import iso_z
+
+# MIME types classified as documents
+_DOCUMENT_MIME_TYPES = frozenset({
+    'application/pdf',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'text/plain',
+    'text/csv',
+    'text/markdown',
+})
+
+# MIME type prefixes mapped to file type, checked in order
+_MIME_PREFIX_TYPES = (
+    ('image/', 'image'),
+)
 
 
 class Attachment(db.Model):
@@ -12,7 +30,7 @@ class Attachment(db.Model):
     __tablename__ = 'attachments'
 
     id = db.Column(db.Integer, primary_key=True)
-    message_id = db.Column(db.Integer, db.ForeignKey('messages.id', ondelete='CASCADE'), nullable=False)
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.id', ondelete='CASCADE'), nullable=False, index=True)
 
     # File information
     original_filename = db.Column(db.String(255), nullable=False)
@@ -25,7 +43,7 @@ class Attachment(db.Model):
     file_type = db.Column(db.String(20), nullable=False)  # 'image', 'document', 'other'
 
     # Timestamps
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow(), server_default=utcnow())
 
     # Relationships
     message = db.relationship('Message', back_populates='attachments')
@@ -44,7 +62,7 @@ class Attachment(db.Model):
             'file_type': self.file_type,
             'mime_type': self.mime_type,
             'file_size': self.file_size,
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'created_at': iso_z(self.created_at),
             'url': f'/api/attachments/{self.id}'  # URL to download/view the file
         }
 
@@ -69,13 +87,9 @@ class Attachment(db.Model):
         Returns:
             File type category: 'image', 'document', or 'other'
         """
-        if mime_type.startswith('image/'):
-            return 'image'
-        elif mime_type in ['application/pdf', 'application/msword',
-                          'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                          'application/vnd.ms-excel',
-                          'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                          'text/plain', 'text/csv', 'text/markdown']:
+        if mime_type in _DOCUMENT_MIME_TYPES:
             return 'document'
-        else:
-            return 'other'
+        for prefix, file_type in _MIME_PREFIX_TYPES:
+            if mime_type.startswith(prefix):
+                return file_type
+        return 'other'
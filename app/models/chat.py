@@ -1,5 +1,9 @@
 from app import db
-from datetime import datetime
+from app.utils.compression import CompressedText
+from app.utils.db_types import BinaryUUID, utcnow
+from app.utils.json_utils import iso_z
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 import uuid
 
 
@@ -7,10 +11,13 @@ class Chat(db.Model):
     """Chat session model"""
 
     __tablename__ = 'chats'
+    # Fetch database-generated timestamps with RETURNING on UPDATE as well
+    # as INSERT, instead of a follow-up SELECT when they are next read
+    __mapper_args__ = {'eager_defaults': True}
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(
-        db.String(36),
+        BinaryUUID,  # 16 raw bytes on SQLite, String(36) elsewhere
         unique=True,
         nullable=False,
         default=lambda: str(uuid.uuid4()),
@@ -29,8 +36,8 @@ class Chat(db.Model):
     is_deleted = db.Column(db.Boolean, default=False)
 
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), onupdate=utcnow(), nullable=False)
 
     # Relationships
     user = db.relationship('User', back_populates='chats')
@@ -38,25 +45,44 @@ class Chat(db.Model):
         'Message',
         back_populates='chat',
         cascade='all, delete-orphan',
-        lazy='dynamic',
+        lazy='select',
         order_by='Message.created_at'
     )
 
+    def get_messages(self):
+        """
+        Load this chat's messages in order, with attachments batch-loaded
+        in one extra SELECT ... IN query instead of a row-multiplying join.
+
+        Returns:
+            list: Message objects ordered by created_at
+        """
+        return Message.query.options(selectinload(Message.attachments))\
+            .filter(Message.chat_id == self.id)\
+            .order_by(Message.created_at)\
+            .all()
+
     def to_dict(self, include_messages=False):
         """Convert chat to dictionary"""
+        # messages is a plain list relationship; count in SQL rather than
+        # loading every row just for len()
+        message_count = db.session.query(func.count(Message.id))\
+            .filter(Message.chat_id == self.id)\
+            .scalar()
+
         data = {
             'id': self.id,
             'session_id': self.session_id,
             'name': self.name,
             'model_provider': self.model_provider,
             'model_name': self.model_name,
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() + 'Z' if self.updated_at else None,
-            'message_count': self.messages.count()
+            'created_at': iso_z(self.created_at),
+            'updated_at': iso_z(self.updated_at),
+            'message_count': message_count
         }
 
         if include_messages:
-            data['messages'] = [msg.to_dict() for msg in self.messages.all()]
+            data['messages'] = [msg.to_dict() for msg in self.get_messages()]
 
         return data
 
@@ -68,13 +94,18 @@ class Message(db.Model):
     """Chat message model"""
 
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Serves "messages for a chat ordered by time" as a single range scan;
+        # also covers plain chat_id lookups, so chat_id needs no index of its own
+        db.Index('ix_messages_chat_id_created_at', 'chat_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    chat_id = db.Column(db.Integer, db.ForeignKey('chats.id'), nullable=False, index=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chats.id'), nullable=False)
 
     role = db.Column(db.String(20), nullable=False)  # 'user' or 'assistant'
-    content = db.Column(db.Text, nullable=False)
-    distilled_content = db.Column(db.Text, nullable=True)  # Summarized version for context compression
+    content = db.Column(CompressedText, nullable=False)  # Large messages are stored zstd-compressed
+    distilled_content = db.Column(CompressedText, nullable=True)  # Summarized version for context compression
 
     # Metadata
     tokens_used = db.Column(db.Integer, default=0)
@@ -86,7 +117,7 @@ class Message(db.Model):
     tokens_estimated = db.Column(db.Boolean, default=False)  # True if tokens were estimated (local models)
 
     # Timestamp
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), nullable=False, index=True)
 
     # Relationships
     chat = db.relationship('Chat', back_populates='messages')
@@ -109,7 +140,7 @@ class Message(db.Model):
             'input_tokens': self.input_tokens or 0,
             'output_tokens': self.output_tokens or 0,
             'tokens_estimated': self.tokens_estimated or False,
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'created_at': iso_z(self.created_at),
             'attachments': [att.to_dict() for att in self.attachments] if self.attachments else []
         }
 
@@ -4,6 +4,31 @@ Supports document storage, chunking, and embedding references.
 """
 from datetime import datetime
 from app import db
+from app.utils.json_utils import iso_z
+
+# MIME type to document file type
+_MIME_TO_TYPE = {
+    'application/pdf': 'pdf',
+    'text/plain': 'txt',
+    'text/markdown': 'md',
+    'text/csv': 'csv',
+    'application/json': 'json',
+    'application/msword': 'doc',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/vnd.ms-excel': 'xls',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+
+# MIME types accepted for RAG documents (legacy .doc/.xls are not)
+_SUPPORTED_MIME_TYPES = (
+    'application/pdf',
+    'text/plain',
+    'text/markdown',
+    'text/csv',
+    'application/json',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+)
 
 
 class Document(db.Model):
@@ -62,11 +87,44 @@ class Document(db.Model):
             'chunk_count': self.chunk_count,
             'total_tokens': self.total_tokens,
             'embedding_model': self.embedding_model,
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() + 'Z' if self.updated_at else None,
-            'processed_at': self.processed_at.isoformat() + 'Z' if self.processed_at else None,
+            'created_at': iso_z(self.created_at),
+            'updated_at': iso_z(self.updated_at),
+            'processed_at': iso_z(self.processed_at),
         }
 
+    # Columns returned by to_dict, split into plain values and timestamps
+    _DICT_FIELDS = (
+        'id', 'user_id', 'original_filename', 'file_type', 'mime_type', 'file_size',
+        'status', 'error_message', 'chunk_count', 'total_tokens', 'embedding_model',
+    )
+    _DICT_TIMESTAMPS = ('created_at', 'updated_at', 'processed_at')
+
+    @classmethod
+    def serialize_many(cls, query) -> list:
+        """
+        Serialize the documents matched by a query, same output as to_dict().
+
+        Selects only the needed columns as plain rows, so listing many
+        documents skips building ORM objects and the identity map.
+
+        Args:
+            query: Document query (filters and ordering applied)
+
+        Returns:
+            List of document dictionaries
+        """
+        fields, timestamps = cls._DICT_FIELDS, cls._DICT_TIMESTAMPS
+        columns = [getattr(cls, name) for name in fields + timestamps]
+        split = len(fields)
+
+        return [
+            {
+                **dict(zip(fields, row[:split])),
+                **dict(zip(timestamps, map(iso_z, row[split:]))),
+            }
+            for row in query.with_entities(*columns).all()
+        ]
+
     @property
     def is_ready(self):
         """Check if document is ready for RAG queries."""
@@ -112,31 +170,12 @@ class Document(db.Model):
         Returns:
             File type: 'pdf', 'txt', 'docx', 'xlsx', 'md', 'csv', 'json', or 'unknown'
         """
-        mime_to_type = {
-            'application/pdf': 'pdf',
-            'text/plain': 'txt',
-            'text/markdown': 'md',
-            'text/csv': 'csv',
-            'application/json': 'json',
-            'application/msword': 'doc',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
-            'application/vnd.ms-excel': 'xls',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
-        }
-        return mime_to_type.get(mime_type, 'unknown')
+        return _MIME_TO_TYPE.get(mime_type, 'unknown')
 
     @staticmethod
     def get_supported_mime_types() -> list:
         """Return list of supported MIME types for RAG documents."""
-        return [
-            'application/pdf',
-            'text/plain',
-            'text/markdown',
-            'text/csv',
-            'application/json',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        ]
+        return list(_SUPPORTED_MIME_TYPES)
 
 
 class DocumentChunk(db.Model):
@@ -152,7 +191,9 @@ class DocumentChunk(db.Model):
 
     # Chunk content
     chunk_index = db.Column(db.Integer, nullable=False)  # Order within document
-    content = db.Column(db.Text, nullable=False)
+    # Deferred: loaded on first access, so queries that only need chunk
+    # metadata (including the delete cascade) skip the text
+    content = db.deferred(db.Column(db.Text, nullable=False))
     token_count = db.Column(db.Integer, nullable=False)
 
     # Position tracking for citations
@@ -189,7 +230,7 @@ class DocumentChunk(db.Model):
             'end_char': self.end_char,
             'page_number': self.page_number,
             'chroma_id': self.chroma_id,
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'created_at': iso_z(self.created_at),
         }
 
     def to_retrieval_dict(self):
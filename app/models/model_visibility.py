@@ -1,7 +1,12 @@
 """Model Visibility Configuration"""
 
 from app import db
+from sqlalchemy import insert, select
 from datetime import datetime
+import threading
+import time
+
+_models_cache_lock = threading.Lock()
 
 
 class ModelVisibility(db.Model):
@@ -22,6 +27,13 @@ class ModelVisibility(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    # In-process cache of get_enabled_models(), shared by all requests in this worker
+    # Structure: (timestamp, version, models) or None
+    _enabled_models_cache = None
+    # Bumped by clear_cache(); a result loaded under an older version is never reused
+    _cache_version = 0
+    MODELS_CACHE_TTL = 60  # seconds - bounds staleness in other worker processes
+
     def __repr__(self):
         return f'<ModelVisibility {self.provider}: {self.is_enabled}>'
 
@@ -87,28 +99,57 @@ class ModelVisibility(db.Model):
             }
         ]
 
-        for model_data in default_models:
-            existing = ModelVisibility.query.filter_by(provider=model_data['provider']).first()
-            if not existing:
-                model = ModelVisibility(**model_data)
-                db.session.add(model)
+        # One lookup for the providers that already exist, one INSERT for the rest
+        existing_providers = set(db.session.scalars(
+            select(ModelVisibility.provider)
+            .where(ModelVisibility.provider.in_([m['provider'] for m in default_models]))
+        ))
+        missing_models = [m for m in default_models if m['provider'] not in existing_providers]
 
         try:
+            if missing_models:
+                db.session.execute(insert(ModelVisibility), missing_models)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             raise e
 
+        ModelVisibility.clear_cache()
+
+    @staticmethod
+    def clear_cache():
+        """
+        Invalidate the cached enabled models list.
+        Call after committing any change to model visibility.
+        """
+        with _models_cache_lock:
+            ModelVisibility._cache_version += 1
+            ModelVisibility._enabled_models_cache = None
+
     @staticmethod
     def get_enabled_models():
         """
         Get all enabled models sorted by sort_order.
+        The result is cached in-process for MODELS_CACHE_TTL seconds.
 
         Returns:
             list: List of enabled model dictionaries
         """
+        now = time.monotonic()
+        version = ModelVisibility._cache_version
+        cached = ModelVisibility._enabled_models_cache
+        if cached is not None and cached[1] == version and now - cached[0] < ModelVisibility.MODELS_CACHE_TTL:
+            return cached[2]
+
         models = ModelVisibility.query.filter_by(is_enabled=True).order_by(ModelVisibility.sort_order).all()
-        return [model.to_dict() for model in models]
+        result = [model.to_dict() for model in models]
+
+        with _models_cache_lock:
+            # Skip storing if the models changed while this query ran
+            if ModelVisibility._cache_version == version:
+                ModelVisibility._enabled_models_cache = (now, version, result)
+
+        return result
 
     @staticmethod
     def get_all_models():
@@ -1,8 +1,17 @@
 """Password history model for tracking password changes"""
 
 from app import db
+from app.utils.password_hashing import verify_password
 from datetime import datetime
-from werkzeug.security import check_password_hash
+from flask import current_app
+from sqlalchemy import delete, insert, select
+import hashlib
+import hmac
+
+
+def _hmac_key() -> bytes:
+    """Key for password HMACs, derived from SECRET_KEY"""
+    return hashlib.sha256(b'password-history:' + current_app.config['SECRET_KEY'].encode()).digest()
 
 
 class PasswordHistory(db.Model):
@@ -14,20 +23,61 @@ class PasswordHistory(db.Model):
     __tablename__ = 'password_history'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    # Keyed fast hash of the same password, used to skip the slow KDF check
+    # for passwords that cannot match (NULL for entries saved before it existed)
+    password_hmac = db.Column(db.LargeBinary(32), nullable=True)
+    # Fingerprint of the key password_hmac was made with (see hmac_key_id)
+    password_hmac_key_id = db.Column(db.LargeBinary(8), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationship
     user = db.relationship('User', backref=db.backref('password_history', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True))
 
+    # Composite index for reading a user's history newest first
+    __table_args__ = (
+        db.Index('ix_password_history_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<PasswordHistory for User {self.user_id}>'
 
+    @staticmethod
+    def compute_password_hmac(password: str) -> bytes:
+        """
+        Compute the keyed fast hash used to pre-screen password reuse.
+        Keyed with a value derived from SECRET_KEY, so it cannot be
+        brute-forced without the server secret. Store it together with
+        hmac_key_id().
+
+        Args:
+            password: Plain text password
+
+        Returns:
+            bytes: 32-byte HMAC-SHA256 digest
+        """
+        return hmac.new(_hmac_key(), password.encode('utf-8'), hashlib.sha256).digest()
+
+    @staticmethod
+    def hmac_key_id() -> bytes:
+        """
+        Fingerprint of the current HMAC key.
+        HMACs stamped with a different fingerprint were made before a
+        SECRET_KEY change and can no longer be compared.
+
+        Returns:
+            bytes: 8-byte key fingerprint
+        """
+        return hashlib.sha256(b'key-id:' + _hmac_key()).digest()[:8]
+
     @staticmethod
     def check_password_reuse(user_id: int, new_password: str, history_limit: int = 5) -> bool:
         """
         Check if a new password has been used recently.
+        Entries with an HMAC made with the current key are screened with it
+        first, so the slow password hash is only checked for likely matches,
+        entries without an HMAC and entries from before a SECRET_KEY change.
 
         Args:
             user_id: The user ID
@@ -43,41 +93,58 @@ class PasswordHistory(db.Model):
             .limit(history_limit)\
             .all()
 
+        new_hmac = PasswordHistory.compute_password_hmac(new_password)
+        key_id = PasswordHistory.hmac_key_id()
+
         # Check if new password matches any recent password
         for entry in history:
-            if check_password_hash(entry.password_hash, new_password):
+            if (
+                entry.password_hmac is not None
+                and entry.password_hmac_key_id == key_id
+                and not hmac.compare_digest(entry.password_hmac, new_hmac)
+            ):
+                continue
+            if verify_password(entry.password_hash, new_password):
                 return True
 
         return False
 
     @staticmethod
-    def add_password_to_history(user_id: int, password_hash: str):
+    def record_and_prune(user_id: int, password_hash: str, password_hmac: bytes = None,
+                         password_hmac_key_id: bytes = None, keep_count: int = 10):
         """
-        Add a password hash to the user's history.
+        Add a password hash to the user's history and drop entries beyond
+        the most recent ones.
+        Runs as one INSERT and one DELETE with no reads in between; the
+        DELETE keeps the newest entries with a subquery instead of looking
+        up a cutoff row first.
 
         Args:
             user_id: The user ID
             password_hash: The hashed password to store
-        """
-        entry = PasswordHistory(user_id=user_id, password_hash=password_hash)
-        db.session.add(entry)
-
-    @staticmethod
-    def cleanup_old_history(user_id: int, keep_count: int = 10):
-        """
-        Remove old password history entries, keeping only the most recent ones.
-
-        Args:
-            user_id: The user ID
+            password_hmac: HMAC of the same password (see compute_password_hmac), if known
+            password_hmac_key_id: Fingerprint of the key password_hmac was made with
             keep_count: Number of recent passwords to keep (default 10)
         """
-        # Get all history entries for user, ordered by date
-        all_history = PasswordHistory.query.filter_by(user_id=user_id)\
-            .order_by(PasswordHistory.created_at.desc())\
-            .all()
-
-        # If we have more than keep_count entries, delete the oldest ones
-        if len(all_history) > keep_count:
-            to_delete = all_history[keep_count:]
-            for entry in to_delete:
-                db.session.delete(entry)
+        db.session.execute(
+            insert(PasswordHistory).values(
+                user_id=user_id,
+                password_hash=password_hash,
+                password_hmac=password_hmac,
+                password_hmac_key_id=password_hmac_key_id
+            )
+        )
+
+        # Newest first; id breaks created_at ties
+        keep_ids = select(PasswordHistory.id)\
+            .where(PasswordHistory.user_id == user_id)\
+            .order_by(PasswordHistory.created_at.desc(), PasswordHistory.id.desc())\
+            .limit(keep_count)
+        db.session.execute(
+            delete(PasswordHistory)
+            .where(
+                PasswordHistory.user_id == user_id,
+                PasswordHistory.id.not_in(keep_ids)
+            )
+            .execution_options(synchronize_session=False)
+        )
@@ -2,19 +2,42 @@
 
 from app import db
 from datetime import datetime, timedelta
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+import hashlib
 import secrets
 
+# How long a pending 2FA token stays valid
+PENDING_2FA_TTL = timedelta(minutes=5)
+
+
+def _get_serializer() -> URLSafeTimedSerializer:
+    """Serializer that signs pending 2FA tokens with the app SECRET_KEY"""
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='pending-2fa')
+
+
+def _hash_token(token: str) -> str:
+    """Stored form of a used token (the token itself is never stored)"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
 
 class Pending2FAVerification(db.Model):
     """
     Track pending 2FA verifications during login.
     These are temporary and expire after 5 minutes.
+
+    Tokens are signed and carry the user ID and issue time, so issuing and
+    checking one needs no database access. A row is only written when a
+    token is used, to stop the same token completing a second login, and
+    is purged again once the token has expired.
     """
 
     __tablename__ = 'pending_2fa_verifications'
 
     id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    token = db.Column(db.String(64), unique=True, nullable=False, index=True)  # SHA-256 of the used token
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
@@ -34,68 +57,93 @@ class Pending2FAVerification(db.Model):
         Returns:
             The verification token
         """
-        token = secrets.token_urlsafe(32)
-        expires_at = datetime.utcnow() + timedelta(minutes=5)
-
-        pending = Pending2FAVerification(
-            token=token,
-            user_id=user_id,
-            expires_at=expires_at
-        )
-
-        db.session.add(pending)
-        db.session.commit()
-
-        return token
+        # The nonce makes every token unique, even within the same second
+        return _get_serializer().dumps({'uid': user_id, 'n': secrets.token_urlsafe(8)})
 
     @staticmethod
     def verify_token(token: str) -> 'Pending2FAVerification':
         """
         Verify a pending 2FA token.
+        Checks the signature and age only; use mark_verified to consume it.
 
         Args:
             token: The verification token
 
         Returns:
-            Pending2FAVerification object if valid, None otherwise
+            Unsaved Pending2FAVerification with user_id set if valid, None otherwise
         """
-        pending = Pending2FAVerification.query.filter_by(token=token).first()
-
-        if not pending:
+        try:
+            payload, issued_at = _get_serializer().loads(
+                token,
+                max_age=int(PENDING_2FA_TTL.total_seconds()),
+                return_timestamp=True
+            )
+        except (SignatureExpired, BadSignature):
             return None
 
-        # Check if expired
-        if datetime.utcnow() > pending.expires_at:
-            db.session.delete(pending)
-            db.session.commit()
+        if not isinstance(payload, dict) or not isinstance(payload.get('uid'), int):
             return None
 
-        # Check if already verified
-        if pending.verified:
-            return None
-
-        return pending
+        issued_at = issued_at.replace(tzinfo=None)
+        return Pending2FAVerification(
+            token=_hash_token(token),
+            user_id=payload['uid'],
+            created_at=issued_at,
+            expires_at=issued_at + PENDING_2FA_TTL
+        )
 
     @staticmethod
-    def mark_verified(token: str):
+    def mark_verified(token: str) -> bool:
         """
-        Mark a token as verified and delete it.
+        Consume a token so it cannot complete another login.
+        Used tokens that have expired are purged at the same time, so the
+        table only holds tokens used within the last PENDING_2FA_TTL.
+
+        The row is flushed but not committed: the caller commits it with the
+        login, or rolls back (e.g. on a wrong code) to leave the token usable.
 
         Args:
             token: The verification token
+
+        Returns:
+            bool: True if the token was valid and unused, False otherwise
         """
-        pending = Pending2FAVerification.query.filter_by(token=token).first()
-        if pending:
-            db.session.delete(pending)
-            db.session.commit()
+        pending = Pending2FAVerification.verify_token(token)
+        if not pending:
+            return False
+
+        Pending2FAVerification._delete_expired()
+
+        pending.verified = True
+        db.session.add(pending)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Unique token hash - already used
+            db.session.rollback()
+            return False
+        return True
 
     @staticmethod
     def cleanup_expired():
         """
-        Clean up expired pending verifications.
-        Should be run periodically.
+        Clean up used tokens that have expired anyway.
+        mark_verified already does this on every 2FA login; this is for
+        purging on demand.
+
+        Returns:
+            int: Number of verifications removed
         """
-        Pending2FAVerification.query.filter(
-            Pending2FAVerification.expires_at < datetime.utcnow()
-        ).delete()
+        removed = Pending2FAVerification._delete_expired()
         db.session.commit()
+        return removed
+
+    @staticmethod
+    def _delete_expired() -> int:
+        """Delete expired rows in the current transaction and return the count"""
+        result = db.session.execute(
+            delete(Pending2FAVerification)
+            .where(Pending2FAVerification.expires_at < datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
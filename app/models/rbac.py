@@ -2,6 +2,8 @@
 
 from app import db
 from datetime import datetime
+from functools import cached_property
+from sqlalchemy import insert, select
 
 
 # Association tables for many-to-many relationships
@@ -36,6 +38,7 @@ class Role(db.Model):
     # Relationships
     permissions = db.relationship('Permission', secondary=role_permissions,
                                  back_populates='roles', lazy='dynamic')
+    users = db.relationship('User', secondary=user_roles, back_populates='roles')
 
     def __repr__(self):
         return f'<Role {self.name}>'
@@ -75,11 +78,13 @@ class Role(db.Model):
             }
         ]
 
-        for role_data in default_roles:
-            existing_role = Role.query.filter_by(name=role_data['name']).first()
-            if not existing_role:
-                role = Role(**role_data)
-                db.session.add(role)
+        # One lookup for the roles that already exist, one INSERT for the rest
+        existing_names = set(db.session.scalars(
+            select(Role.name).where(Role.name.in_([r['name'] for r in default_roles]))
+        ))
+        missing_roles = [r for r in default_roles if r['name'] not in existing_names]
+        if missing_roles:
+            db.session.execute(insert(Role), missing_roles)
 
         db.session.commit()
 
@@ -93,17 +98,50 @@ class Role(db.Model):
         Returns:
             True if role has permission, False otherwise
         """
-        return self.permissions.filter_by(name=permission_name).first() is not None
+        return permission_name in self._permission_names
+
+    @cached_property
+    def _permission_names(self) -> frozenset:
+        """Names of this role's permissions, loaded once per instance"""
+        return frozenset(
+            name for (name,) in self.permissions.with_entities(Permission.name)
+        )
+
+    def _clear_permission_cache(self):
+        self.__dict__.pop('_permission_names', None)
 
     def add_permission(self, permission):
         """Add a permission to this role"""
         if not self.has_permission(permission.name):
             self.permissions.append(permission)
+            self._clear_permission_cache()
+
+    def add_permissions(self, permissions):
+        """
+        Add several permissions to this role with a single INSERT.
+        Permissions the role already has are skipped.
+
+        Args:
+            permissions: Iterable of Permission objects
+        """
+        missing = {
+            perm.id: perm for perm in permissions
+            if perm.name not in self._permission_names
+        }
+        if not missing:
+            return
+
+        db.session.execute(
+            insert(role_permissions),
+            [{'role_id': self.id, 'permission_id': perm_id} for perm_id in missing]
+        )
+        self._clear_permission_cache()
 
     def remove_permission(self, permission):
         """Remove a permission from this role"""
         if self.has_permission(permission.name):
             self.permissions.remove(permission)
+            self._clear_permission_cache()
 
 
 class Permission(db.Model):
@@ -152,11 +190,13 @@ class Permission(db.Model):
             {'name': 'admin.config', 'resource': 'admin', 'action': 'config', 'description': 'Modify system configuration'},
         ]
 
-        for perm_data in default_permissions:
-            existing_perm = Permission.query.filter_by(name=perm_data['name']).first()
-            if not existing_perm:
-                permission = Permission(**perm_data)
-                db.session.add(permission)
+        # One lookup for the permissions that already exist, one INSERT for the rest
+        existing_names = set(db.session.scalars(
+            select(Permission.name).where(Permission.name.in_([p['name'] for p in default_permissions]))
+        ))
+        missing_permissions = [p for p in default_permissions if p['name'] not in existing_names]
+        if missing_permissions:
+            db.session.execute(insert(Permission), missing_permissions)
 
         db.session.commit()
 
@@ -172,16 +212,13 @@ class Permission(db.Model):
         # Super Admin - all permissions
         super_admin = Role.query.filter_by(name='super_admin').first()
         if super_admin:
-            for perm in all_permissions:
-                super_admin.add_permission(perm)
+            super_admin.add_permissions(all_permissions)
 
         # User - chat permissions only
         user_role = Role.query.filter_by(name='user').first()
         if user_role:
-            user_permissions = Permission.query.filter(
-                Permission.resource == 'chat'
-            ).all()
-            for perm in user_permissions:
-                user_role.add_permission(perm)
+            user_role.add_permissions(
+                perm for perm in all_permissions if perm.resource == 'chat'
+            )
 
         db.session.commit()
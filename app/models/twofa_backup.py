@@ -1,9 +1,40 @@
 """Two-Factor Authentication Backup Codes Model"""
 
 from app import db
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, update
 from werkzeug.security import generate_password_hash, check_password_hash
 from typing import List
+import hashlib
+import hmac
+import os
+import threading
+
+# Shared pool for hashing backup codes. hashlib's scrypt/PBKDF2 release the
+# GIL, so threads hash in parallel without the process start-up cost (and
+# frozen-executable pitfalls) of a process pool.
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    """Create the hashing thread pool on first use"""
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(
+                    max_workers=min(10, os.cpu_count() or 1),
+                    thread_name_prefix='backup-code-hash'
+                )
+    return _hash_executor
+
+
+def _hmac_key() -> bytes:
+    """Key for backup code HMACs, derived from SECRET_KEY"""
+    return hashlib.sha256(b'twofa-backup-code:' + current_app.config['SECRET_KEY'].encode()).digest()
 
 
 class TwoFABackupCode(db.Model):
@@ -15,8 +46,10 @@ class TwoFABackupCode(db.Model):
     __tablename__ = 'twofa_backup_codes'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     code_hash = db.Column(db.String(255), nullable=False)
+    code_hmac = db.Column(db.LargeBinary(32), nullable=True, index=True)  # NULL for codes created before lookup by HMAC
+    code_hmac_key_id = db.Column(db.LargeBinary(8), nullable=True)  # Key code_hmac was made with (see hmac_key_id)
     used = db.Column(db.Boolean, default=False, nullable=False)
     used_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -24,33 +57,79 @@ class TwoFABackupCode(db.Model):
     # Relationship
     user = db.relationship('User', backref=db.backref('backup_codes', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True))
 
+    # Composite index for finding a user's unused codes
+    __table_args__ = (
+        db.Index('ix_twofa_backup_codes_user_id_used', 'user_id', 'used'),
+    )
+
     def __repr__(self):
         return f'<TwoFABackupCode for User {self.user_id}>'
 
+    @staticmethod
+    def compute_code_hmac(code: str) -> bytes:
+        """
+        Compute the keyed fast hash used to find a backup code.
+        Keyed with a value derived from SECRET_KEY, so it cannot be
+        brute-forced without the server secret. Store it together with
+        hmac_key_id().
+
+        Args:
+            code: Normalized backup code
+
+        Returns:
+            bytes: 32-byte HMAC-SHA256 digest
+        """
+        return hmac.new(_hmac_key(), code.encode('utf-8'), hashlib.sha256).digest()
+
+    @staticmethod
+    def hmac_key_id() -> bytes:
+        """
+        Fingerprint of the current HMAC key.
+        Codes stamped with a different fingerprint were created before a
+        SECRET_KEY change, so their HMAC can no longer be looked up.
+
+        Returns:
+            bytes: 8-byte key fingerprint
+        """
+        return hashlib.sha256(b'key-id:' + _hmac_key()).digest()[:8]
+
     @staticmethod
     def create_backup_codes(user_id: int, codes: List[str]):
         """
         Create backup codes for a user.
+        Codes are hashed in parallel and written with a single bulk INSERT.
 
         Args:
             user_id: The user ID
             codes: List of plain text backup codes
         """
-        for code in codes:
-            # Normalize and hash the code
-            normalized_code = code.replace('-', '').replace(' ', '').upper()
-            code_hash = generate_password_hash(normalized_code)
-
-            backup_code = TwoFABackupCode(
-                user_id=user_id,
-                code_hash=code_hash
-            )
-            db.session.add(backup_code)
+        if not codes:
+            return
+
+        # Normalize the codes, then hash them across the pool
+        normalized_codes = [code.replace('-', '').replace(' ', '').upper() for code in codes]
+        code_hashes = _get_hash_executor().map(generate_password_hash, normalized_codes)
+
+        key_id = TwoFABackupCode.hmac_key_id()
+        rows = [
+            {
+                'user_id': user_id,
+                'code_hash': code_hash,
+                'code_hmac': TwoFABackupCode.compute_code_hmac(code),
+                'code_hmac_key_id': key_id,
+            }
+            for code, code_hash in zip(normalized_codes, code_hashes)
+        ]
+        db.session.execute(insert(TwoFABackupCode), rows)
 
     @staticmethod
     def verify_and_consume(user_id: int, code: str) -> bool:
         """
         Verify a backup code and mark it as used if valid.
+        The code is looked up by its HMAC, so only the matching row's
+        password hash is checked. Codes without an HMAC made with the
+        current key (created before HMACs were stored, or before a
+        SECRET_KEY change) are still checked one by one.
 
         Args:
             user_id: The user ID
@@ -59,19 +138,42 @@ class TwoFABackupCode(db.Model):
         Returns:
             True if code is valid and not used, False otherwise
         """
-        # Get all unused backup codes for user
-        backup_codes = TwoFABackupCode.query.filter_by(
-            user_id=user_id,
-            used=False
+        code_hmac = TwoFABackupCode.compute_code_hmac(code)
+        key_id = TwoFABackupCode.hmac_key_id()
+
+        candidates = TwoFABackupCode.query.filter(
+            TwoFABackupCode.user_id == user_id,
+            TwoFABackupCode.used.is_(False),
+            db.or_(
+                TwoFABackupCode.code_hmac == code_hmac,
+                TwoFABackupCode.code_hmac_key_id.is_(None),
+                TwoFABackupCode.code_hmac_key_id != key_id
+            )
         ).all()
 
-        # Try to match the code
-        for backup_code in backup_codes:
+        # Try the HMAC match first, then codes that can only be checked by hash
+        candidates.sort(key=lambda backup_code: backup_code.code_hmac != code_hmac)
+        for backup_code in candidates:
             if check_password_hash(backup_code.code_hash, code):
-                # Mark as used
-                backup_code.used = True
-                backup_code.used_at = datetime.utcnow()
-                db.session.commit()
-                return True
+                return TwoFABackupCode._consume(backup_code.id)
 
         return False
+
+    @staticmethod
+    def _consume(backup_code_id: int) -> bool:
+        """
+        Mark a backup code as used.
+        The UPDATE only matches an unused code, so two concurrent logins
+        cannot both spend the same code.
+
+        Returns:
+            True if this call used the code, False if it was already used
+        """
+        result = db.session.execute(
+            update(TwoFABackupCode)
+            .where(TwoFABackupCode.id == backup_code_id, TwoFABackupCode.used.is_(False))
+            .values(used=True, used_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
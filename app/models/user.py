@@ -1,8 +1,14 @@
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.password_hashing import hash_password, needs_rehash, verify_password_cached
 from datetime import datetime, date
+from functools import cached_property
+from sqlalchemy import select
+from sqlalchemy.orm import lazyload, raiseload
 from typing import Optional
+import hmac
+import os
+import time
 
 
 class User(UserMixin, db.Model):
@@ -14,6 +20,10 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
+    # HMAC of the current password, carried into password history when it
+    # is replaced (see PasswordHistory.compute_password_hmac)
+    password_hmac = db.Column(db.LargeBinary(32), nullable=True)
+    password_hmac_key_id = db.Column(db.LargeBinary(8), nullable=True)  # see PasswordHistory.hmac_key_id
 
     # User status
     is_active = db.Column(db.Boolean, default=True)
@@ -37,9 +47,16 @@ class User(UserMixin, db.Model):
     # Single session enforcement - only one device can be logged in at a time
     session_token = db.Column(db.String(64), nullable=True, index=True)
 
+    # When registration last found the user limit reached (time.monotonic()),
+    # or None. The TTL bounds staleness in other worker processes.
+    _user_limit_reached_at = None
+    USER_LIMIT_CACHE_TTL = 60  # seconds
+
     # Relationships
     chats = db.relationship('Chat', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
-    roles = db.relationship('Role', secondary='user_roles', backref='users', lazy='dynamic')
+    # Loaded once per instance on first access; role and permission checks
+    # then read the list instead of querying each time
+    roles = db.relationship('Role', secondary='user_roles', back_populates='users', lazy='select')
 
     def set_password(self, password, check_history=False):
         """
@@ -52,30 +69,57 @@ class User(UserMixin, db.Model):
         Returns:
             tuple: (success: bool, error_message: str or None)
         """
+        from app.models.password_history import PasswordHistory
+
         # Check password history if requested
         if check_history and self.id:
-            from app.models.password_history import PasswordHistory
-
             if PasswordHistory.check_password_reuse(self.id, password, history_limit=5):
                 return False, "Password has been used recently. Please choose a different password."
 
         # Hash and set the new password
-        new_hash = generate_password_hash(password)
+        new_hash = hash_password(password)
 
         # Save old password to history if user already exists
         if self.id and self.password_hash:
-            from app.models.password_history import PasswordHistory
-            PasswordHistory.add_password_to_history(self.id, self.password_hash)
-
-            # Clean up old history entries (keep last 10)
-            PasswordHistory.cleanup_old_history(self.id, keep_count=10)
+            # Keep only the last 10 entries
+            PasswordHistory.record_and_prune(
+                self.id,
+                self.password_hash,
+                self.password_hmac,
+                self.password_hmac_key_id,
+                keep_count=10
+            )
 
         self.password_hash = new_hash
+        self._set_password_hmac(password)
         return True, None
 
+    def _set_password_hmac(self, password):
+        """Store the HMAC of the current password and the key it was made with"""
+        from app.models.password_history import PasswordHistory
+
+        self.password_hmac = PasswordHistory.compute_password_hmac(password)
+        self.password_hmac_key_id = PasswordHistory.hmac_key_id()
+
     def check_password(self, password):
         """Check if provided password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        return verify_password_cached(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        """
+        Replace the stored hash if it uses an outdated scheme or cost.
+        Call only after check_password succeeded; the caller commits.
+
+        Returns:
+            bool: True if the hash was replaced
+        """
+        if not needs_rehash(self.password_hash):
+            return False
+        self.password_hash = hash_password(password)
+        # Legacy rows may predate password_hmac; fill it in while the
+        # plaintext is at hand so reuse checks can pre-screen this password
+        self._set_password_hmac(password)
+        return True
 
     def is_account_locked(self):
         """Check if account is currently locked"""
@@ -102,15 +146,16 @@ class User(UserMixin, db.Model):
 
     def generate_session_token(self):
         """Generate a new unique session token for single-session enforcement"""
-        import secrets
-        self.session_token = secrets.token_hex(32)  # 64 character hex string
+        self.session_token = os.urandom(32).hex()  # 64 character hex string
         return self.session_token
 
     def validate_session_token(self, token):
         """Check if the provided session token matches the stored one"""
         if not self.session_token or not token:
             return False
-        return self.session_token == token
+        # Constant-time; compared as bytes so a tampered non-ASCII value
+        # cannot raise TypeError
+        return hmac.compare_digest(self.session_token.encode(), str(token).encode())
 
     def invalidate_session(self):
         """Invalidate the current session token (for logout)"""
@@ -118,40 +163,54 @@ class User(UserMixin, db.Model):
 
     def has_role(self, role_name: str) -> bool:
         """Check if user has a specific role"""
-        from app.models.rbac import Role
-        return self.roles.filter_by(name=role_name).first() is not None
+        return role_name in self._role_names
+
+    @cached_property
+    def _role_names(self) -> frozenset:
+        """Names of this user's roles, built once from the loaded roles list"""
+        return frozenset(role.name for role in self.roles)
+
+    def _clear_role_cache(self):
+        self.__dict__.pop('_role_names', None)
+        self.__dict__.pop('_permission_names', None)
 
     def has_permission(self, permission_name: str) -> bool:
         """Check if user has a specific permission through any of their roles"""
-        from app.models.rbac import Permission
-
         # Super admins have all permissions
         if self.has_role('super_admin'):
             return True
 
-        # Check if any of the user's roles have this permission
-        for role in self.roles:
-            if role.has_permission(permission_name):
-                return True
+        return permission_name in self._permission_names
 
-        return False
+    @cached_property
+    def _permission_names(self) -> frozenset:
+        """Names of the permissions granted by all of this user's roles, in one query"""
+        from app.models.rbac import Permission, role_permissions
+
+        role_ids = [role.id for role in self.roles]
+        if not role_ids:
+            return frozenset()
+        return frozenset(db.session.scalars(
+            select(Permission.name)
+            .join(role_permissions, role_permissions.c.permission_id == Permission.id)
+            .where(role_permissions.c.role_id.in_(role_ids))
+        ))
 
     def add_role(self, role):
         """Add a role to this user"""
         if not self.has_role(role.name):
             self.roles.append(role)
+            self._clear_role_cache()
 
     def remove_role(self, role):
         """Remove a role from this user"""
         if self.has_role(role.name):
             self.roles.remove(role)
+            self._clear_role_cache()
 
     def get_highest_role_level(self) -> int:
         """Get the highest role level for this user"""
-        if self.roles.count() == 0:
-            return 0
-
-        return max(role.level for role in self.roles)
+        return max((role.level for role in self.roles), default=0)
 
     def get_age(self) -> Optional[int]:
         """
@@ -182,6 +241,25 @@ class User(UserMixin, db.Model):
             return 'teen'
         return 'adult'
 
+    @staticmethod
+    def mark_user_limit_reached():
+        """
+        Remember that registration found the user limit reached, so further
+        attempts can be refused without counting users again.
+        """
+        User._user_limit_reached_at = time.monotonic()
+
+    @staticmethod
+    def is_user_limit_reached_cached() -> bool:
+        """Check whether the user limit was seen reached within USER_LIMIT_CACHE_TTL"""
+        reached_at = User._user_limit_reached_at
+        return reached_at is not None and time.monotonic() - reached_at < User.USER_LIMIT_CACHE_TTL
+
+    @staticmethod
+    def clear_user_limit_cache():
+        """Forget the cached user limit state. Call after deleting a user."""
+        User._user_limit_reached_at = None
+
     def to_dict(self, include_email=False, include_age_group=False):
         """Convert user to dictionary"""
         data = {
@@ -200,3 +278,37 @@ class User(UserMixin, db.Model):
 
     def __repr__(self):
         return f'<User {self.username}>'
+
+
+# Relationships the request user may load lazily (one query on first use).
+# With RAISELOAD_CURRENT_USER enabled, any other non-dynamic relationship
+# raises instead, so it must be loaded explicitly.
+USER_LAZY_RELATIONSHIPS = ('roles', 'settings')
+
+
+def get_user(user_id: int) -> Optional[User]:
+    """
+    Get a user by ID, reusing any instance already loaded in this request.
+
+    Args:
+        user_id: The user ID
+
+    Returns:
+        User or None if not found
+    """
+    from flask import current_app, g, has_app_context
+
+    user_id = int(user_id)
+    if not has_app_context():
+        return db.session.get(User, user_id)
+
+    cache = g.setdefault('_user_cache', {})
+    user = cache.get(user_id)
+    if user is None:
+        options = None
+        if current_app.config.get('RAISELOAD_CURRENT_USER'):
+            options = [lazyload(getattr(User, name)) for name in USER_LAZY_RELATIONSHIPS]
+            options.append(raiseload('*'))
+        user = db.session.get(User, user_id, options=options)
+        cache[user_id] = user
+    return user
@@ -1,6 +1,9 @@
 """User settings model for storing user preferences and configurations"""
 from app import db
-from datetime import datetime
+from app.utils.db_types import utcnow
+
+DEFAULT_LM_STUDIO_URL = 'http://localhost:1234/v1/chat/completions'
+DEFAULT_OLLAMA_URL = 'http://localhost:11434/api/chat'
 
 
 class UserSettings(db.Model):
@@ -12,9 +15,9 @@ class UserSettings(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
 
     # Local Model Settings
-    lm_studio_url = db.Column(db.String(255), default='http://localhost:1234/v1/chat/completions')
+    lm_studio_url = db.Column(db.String(255), default=DEFAULT_LM_STUDIO_URL)
     lm_studio_model_id = db.Column(db.String(100), default='')
-    ollama_url = db.Column(db.String(255), default='http://localhost:11434/api/chat')
+    ollama_url = db.Column(db.String(255), default=DEFAULT_OLLAMA_URL)
     ollama_model_id = db.Column(db.String(100), default='')
 
     # API Provider Model Settings
@@ -24,12 +27,24 @@ class UserSettings(db.Model):
     xai_model_id = db.Column(db.String(100), default='')
 
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), nullable=False)
+    updated_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), onupdate=utcnow(), nullable=False)
 
     # Relationships
     user = db.relationship('User', backref=db.backref('settings', uselist=False, lazy=True, cascade='all, delete-orphan', passive_deletes=True))
 
+    # Editable fields and the value an empty string falls back to
+    _FIELDS = (
+        ('lm_studio_url', DEFAULT_LM_STUDIO_URL),
+        ('lm_studio_model_id', ''),
+        ('ollama_url', DEFAULT_OLLAMA_URL),
+        ('ollama_model_id', ''),
+        ('gemini_model_id', ''),
+        ('openai_model_id', ''),
+        ('anthropic_model_id', ''),
+        ('xai_model_id', ''),
+    )
+
     @classmethod
     def get_or_create(cls, user_id):
         """
@@ -55,50 +70,34 @@ class UserSettings(db.Model):
         Returns:
             dict: UserSettings data
         """
-        return {
-            'lm_studio_url': self.lm_studio_url,
-            'lm_studio_model_id': self.lm_studio_model_id,
-            'ollama_url': self.ollama_url,
-            'ollama_model_id': self.ollama_model_id,
-            'gemini_model_id': self.gemini_model_id,
-            'openai_model_id': self.openai_model_id,
-            'anthropic_model_id': self.anthropic_model_id,
-            'xai_model_id': self.xai_model_id,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        data = {name: getattr(self, name) for name, _ in self._FIELDS}
+        data['updated_at'] = self.updated_at.isoformat() if self.updated_at else None
+        return data
 
     def update_from_dict(self, data):
         """
-        Update settings from dictionary
+        Update settings from dictionary.
+        Only fields whose value actually changes are assigned, so re-saving
+        unchanged settings leaves the row clean.
 
         Args:
             data: Dictionary containing settings to update
-        """
-        if 'lm_studio_url' in data:
-            self.lm_studio_url = data['lm_studio_url'].strip() or 'http://localhost:1234/v1/chat/completions'
-
-        if 'lm_studio_model_id' in data:
-            self.lm_studio_model_id = data['lm_studio_model_id'].strip()
-
-        if 'ollama_url' in data:
-            self.ollama_url = data['ollama_url'].strip() or 'http://localhost:11434/api/chat'
-
-        if 'ollama_model_id' in data:
-            self.ollama_model_id = data['ollama_model_id'].strip()
 
-        if 'gemini_model_id' in data:
-            self.gemini_model_id = data['gemini_model_id'].strip()
-
-        if 'openai_model_id' in data:
-            self.openai_model_id = data['openai_model_id'].strip()
-
-        if 'anthropic_model_id' in data:
-            self.anthropic_model_id = data['anthropic_model_id'].strip()
-
-        if 'xai_model_id' in data:
-            self.xai_model_id = data['xai_model_id'].strip()
-
-        self.updated_at = datetime.utcnow()
+        Returns:
+            bool: True if any setting changed
+        """
+        changed = False
+        for name, default in self._FIELDS:
+            value = data.get(name)
+            if value is None:
+                continue
+            value = value.strip() or default
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed = True
+
+        # updated_at is set by the database (onupdate) when changes are flushed
+        return changed
 
     def __repr__(self):
         return f'<UserSettings for User {self.user_id}>'
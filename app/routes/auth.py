@@ -1,13 +1,30 @@
 from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db, limiter, rate_limit_login, rate_limit_register, rate_limit_2fa
+from app.models.pending_2fa import Pending2FAVerification
+from app.models.twofa_backup import TwoFABackupCode
 from app.models.user import User
+from app.models.user_settings import UserSettings
+from app.services.twofa_service import TwoFAService
+from app.utils.db_types import utcnow
+from app.utils.password_hashing import PasswordHashingBusy, is_acceptable_password, verify_dummy_password
 from app.utils.validators import validate_password, validate_email, validate_username, validate_date_of_birth, sanitize_input
 from datetime import datetime
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 bp = Blueprint('auth', __name__)
 
 
+@bp.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    """Too many logins/password changes are being hashed right now"""
+    response = jsonify({'error': 'Server is busy, please try again in a moment'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 # ==================== HTML Page Routes ====================
 
 @bp.route('/profile')
@@ -41,20 +58,36 @@ def register():
         return render_template('register.html')
 
     # Handle registration API for POST requests
+    # Refuse without a query while the limit is known to be reached
+    if User.is_user_limit_reached_cached():
+        return jsonify({
+            'error': f'Maximum user limit ({MAX_USERS}) reached. This is the Home Edition which supports up to {MAX_USERS} users.'
+        }), 403
+
     data = request.get_json()
 
+    username = sanitize_input(data.get('username', ''), max_length=80)
+    email = sanitize_input(data.get('email', ''), max_length=120)
+    password = data.get('password', '')
+    date_of_birth = data.get('date_of_birth', '')
+
+    # User count and username/email conflicts in one query
+    current_user_count, username_taken, email_taken = db.session.execute(
+        select(
+            func.count(),
+            func.coalesce(func.max(case((User.username == username, 1), else_=0)), 0),
+            func.coalesce(func.max(case((User.email == email, 1), else_=0)), 0)
+        ).select_from(User)
+    ).one()
+
     # Check user limit for Home Edition
-    current_user_count = User.query.count()
     if current_user_count >= MAX_USERS:
+        User.mark_user_limit_reached()
         return jsonify({
             'error': f'Maximum user limit ({MAX_USERS}) reached. This is the Home Edition which supports up to {MAX_USERS} users.'
         }), 403
 
     # Validate input
-    username = sanitize_input(data.get('username', ''), max_length=80)
-    email = sanitize_input(data.get('email', ''), max_length=120)
-    password = data.get('password', '')
-    date_of_birth = data.get('date_of_birth', '')
 
     if not username or not email or not password:
         return jsonify({'error': 'Missing required fields'}), 400
@@ -83,10 +116,10 @@ def register():
         return jsonify({'error': dob_error}), 400
 
     # Check if user exists
-    if User.query.filter_by(username=username).first():
+    if username_taken:
         return jsonify({'error': 'Username already exists'}), 400
 
-    if User.query.filter_by(email=email).first():
+    if email_taken:
         return jsonify({'error': 'Email already exists'}), 400
 
     # Parse date of birth
@@ -100,7 +133,12 @@ def register():
         return jsonify({'error': error}), 400
 
     db.session.add(user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Registered concurrently with the same username or email
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 400
 
     return jsonify({
         'message': 'User created successfully',
@@ -108,6 +146,28 @@ def register():
     }), 201
 
 
+def _complete_login(user):
+    """
+    Log the user in and build the success response.
+    Any pending changes to the user (failed-attempt reset, password
+    rehash) are written together with last_login and the new session
+    token in a single UPDATE.
+    """
+    # Evaluated by the database as part of the UPDATE
+    user.last_login = utcnow()
+    # Generate new session token for single-session enforcement
+    session_token = user.generate_session_token()
+    login_user(user, remember=True)
+    # Store session token in Flask session for validation
+    session['session_token'] = session_token
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Login successful',
+        'user': user.to_dict(include_email=True)
+    }), 200
+
+
 @bp.route('/login', methods=['GET', 'POST'])
 @limiter.limit(rate_limit_login)
 def login():
@@ -127,11 +187,17 @@ def login():
     if not username or not password:
         return jsonify({'error': 'Missing username or password'}), 400
 
+    # No stored password can be this long; refuse before doing any hashing
+    if not is_acceptable_password(password):
+        return jsonify({'error': 'Invalid credentials'}), 401
+
     # Find user
     user = User.query.filter_by(username=username).first()
 
-    # If user doesn't exist, return generic error to prevent username enumeration
+    # If user doesn't exist, return generic error to prevent username enumeration.
+    # A dummy verification keeps the response time the same as for a real user.
     if not user:
+        verify_dummy_password(password)
         return jsonify({'error': 'Invalid credentials'}), 401
 
     # Check if account is locked
@@ -164,11 +230,14 @@ def login():
     # Successful password verification - reset failed attempts
     user.reset_failed_login()
 
+    # Upgrade legacy or outdated password hashes while the password is known
+    user.rehash_password_if_needed(password)
+
     # Check if 2FA is enabled
     if user.twofa_enabled:
         # Create pending 2FA verification
-        from app.models.pending_2fa import Pending2FAVerification
         token = Pending2FAVerification.create_pending_verification(user.id)
+        db.session.commit()
 
         return jsonify({
             'message': '2FA verification required',
@@ -177,18 +246,7 @@ def login():
         }), 200
 
     # No 2FA required - complete login
-    user.last_login = datetime.utcnow()
-    # Generate new session token for single-session enforcement
-    session_token = user.generate_session_token()
-    login_user(user, remember=True)
-    # Store session token in Flask session for validation
-    session['session_token'] = session_token
-    db.session.commit()
-
-    return jsonify({
-        'message': 'Login successful',
-        'user': user.to_dict(include_email=True)
-    }), 200
+    return _complete_login(user)
 
 
 @bp.route('/logout', methods=['POST'])
@@ -226,6 +284,9 @@ def change_password():
     if not current_password or not new_password:
         return jsonify({'error': 'Missing required fields'}), 400
 
+    if not is_acceptable_password(current_password):
+        return jsonify({'error': 'Current password is incorrect'}), 401
+
     # Verify current password
     if not current_user.check_password(current_password):
         return jsonify({'error': 'Current password is incorrect'}), 401
@@ -255,9 +316,6 @@ def change_password():
 @limiter.limit(rate_limit_2fa)
 def verify_2fa():
     """Verify 2FA code and complete login"""
-    from app.services.twofa_service import TwoFAService
-    from app.models.pending_2fa import Pending2FAVerification
-
     data = request.get_json()
     token = data.get('2fa_token', '')
     code = data.get('code', '')
@@ -273,11 +331,18 @@ def verify_2fa():
         return jsonify({'error': 'Invalid or expired 2FA token'}), 401
 
     # Get user
-    user = User.query.get(pending.user_id)
+    # Roles are loaded up front for to_dict() in the login response
+    user = db.session.get(User, pending.user_id, options=[selectinload(User.roles)])
 
     if not user or not user.is_active:
         return jsonify({'error': 'User not found or inactive'}), 401
 
+    # Consume the token before checking the code, so a replayed token is
+    # rejected without spending a backup code. The row is committed with
+    # the login (or the backup code), or rolled back if the code is wrong.
+    if not Pending2FAVerification.mark_verified(token):
+        return jsonify({'error': 'Invalid or expired 2FA token'}), 401
+
     # Verify the 2FA code
     code_valid = False
 
@@ -289,24 +354,12 @@ def verify_2fa():
         code_valid = TwoFAService.verify_totp_code(user, code)
 
     if not code_valid:
+        # Release the token so the user can try another code
+        db.session.rollback()
         return jsonify({'error': 'Invalid 2FA code'}), 401
 
-    # Mark pending verification as complete
-    Pending2FAVerification.mark_verified(token)
-
     # Complete login
-    user.last_login = datetime.utcnow()
-    # Generate new session token for single-session enforcement
-    session_token = user.generate_session_token()
-    login_user(user, remember=True)
-    # Store session token in Flask session for validation
-    session['session_token'] = session_token
-    db.session.commit()
-
-    return jsonify({
-        'message': 'Login successful',
-        'user': user.to_dict(include_email=True)
-    }), 200
+    return _complete_login(user)
 
 
 # ==================== 2FA Management Endpoints ====================
@@ -315,8 +368,6 @@ def verify_2fa():
 @login_required
 def enroll_2fa():
     """Start 2FA enrollment process"""
-    from app.services.twofa_service import TwoFAService
-
     user = current_user
 
     if user.twofa_enabled:
@@ -341,8 +392,6 @@ def enroll_2fa():
 @login_required
 def verify_2fa_enrollment():
     """Complete 2FA enrollment by verifying a code"""
-    from app.services.twofa_service import TwoFAService
-
     user = current_user
     data = request.get_json()
     code = data.get('code', '')
@@ -361,7 +410,6 @@ def verify_2fa_enrollment():
     backup_codes = TwoFAService.generate_backup_codes()
 
     # Store backup codes
-    from app.models.twofa_backup import TwoFABackupCode
     TwoFABackupCode.create_backup_codes(user.id, backup_codes)
 
     # Enable 2FA
@@ -379,8 +427,6 @@ def verify_2fa_enrollment():
 @login_required
 def disable_2fa():
     """Disable 2FA for the current user"""
-    from app.services.twofa_service import TwoFAService
-
     user = current_user
     data = request.get_json()
     password = data.get('password', '')
@@ -402,8 +448,6 @@ def disable_2fa():
 @login_required
 def regenerate_backup_codes():
     """Regenerate backup codes"""
-    from app.services.twofa_service import TwoFAService
-
     user = current_user
     data = request.get_json()
     code = data.get('code', '')
@@ -429,8 +473,6 @@ def regenerate_backup_codes():
 @login_required
 def get_2fa_status():
     """Get 2FA status for current user"""
-    from app.services.twofa_service import TwoFAService
-
     user = current_user
 
     status = {
@@ -451,8 +493,6 @@ def get_2fa_status():
 @login_required
 def get_settings():
     """Get user settings (JSON API)"""
-    from app.models.user_settings import UserSettings
-
     settings = UserSettings.get_or_create(current_user.id)
 
     return jsonify(settings.to_dict()), 200
@@ -462,8 +502,6 @@ def get_settings():
 @login_required
 def save_settings():
     """Save user settings"""
-    from app.models.user_settings import UserSettings
-
     data = request.get_json()
 
     if not data:
@@ -471,8 +509,9 @@ def save_settings():
 
     try:
         settings = UserSettings.get_or_create(current_user.id)
-        settings.update_from_dict(data)
-        db.session.commit()
+        # Nothing to write when the form was re-saved unchanged
+        if settings.update_from_dict(data):
+            db.session.commit()
 
         return jsonify({
             'status': 'success',
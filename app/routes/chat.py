@@ -1,29 +1,106 @@
 from flask import Blueprint, request, jsonify, send_file, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from app import db, limiter, rate_limit_chat, rate_limit_attachment_upload, rate_limit_document_upload, rate_limit_improve_prompt
+from app import db, limiter, refresh_rate_limits, rate_limit_chat, rate_limit_attachment_upload, rate_limit_document_upload, rate_limit_improve_prompt
 from app.models.chat import Chat, Message
 from app.models.attachment import Attachment
 from app.models.document import Document
 from app.services.ai_service import AIService
 from app.services.file_service import FileService
 from app.services.rag_service import RAGService
+from app.utils.auth import validate_session_token
+from app.utils.compression import CompressedText
+from app.utils.http_client import get_session
+from app.utils.json_utils import iso_z, loads, sse_event
 import uuid
 import os
-import json
 import io
 import zipfile
+import queue
 import re
 from datetime import datetime
+import threading
 import time
 import requests as http_requests
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import case, insert, select, type_coerce, update
+from sqlalchemy.orm import selectinload
 
 bp = Blueprint('chat', __name__)
 
+# Single session enforcement for every route in this blueprint
+bp.before_request(validate_session_token)
+
 # Model list cache for available-models endpoint
 # Structure: {provider: {'models': [...], 'timestamp': float}}
 _model_list_cache = {}
 MODEL_CACHE_TTL = 300  # 5 minutes in seconds
 
+# Model reasoning blocks, stripped before summarizing and exporting
+THINK_TAG_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+
+# Prompt for summarizing one exchange into distilled context, filled in with
+# str.format (user_message, response)
+DISTILLED_SUMMARY_PROMPT = """Summarize the following conversation exchange. Be extremely brief - aim for 1-2 sentences each.
+
+IMPORTANT: Write summaries as direct statements, NOT descriptions of what was said.
+- WRONG: "The user asked about the capital" or "The assistant explained that..."
+- CORRECT: "What is the capital of France?" or "The capital of France is Paris."
+
+The user's message: {user_message}
+
+The response given: {response}
+
+Provide two ultra-brief summaries in this exact format:
+USER: [Restate the user's question/request directly]
+ASSISTANT: [State the key information from the response directly, as facts]"""
+
+# "USER: ..." / "ASSISTANT: ..." lines (any case) in a distilled context summary
+DISTILLED_SUMMARY_RE = re.compile(
+    r'^[^\S\n]*(?:USER:(?P<user>.*)|ASSISTANT:(?P<assistant>.*))$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Streamed chunks are sent in batches: frames that arrive while the previous
+# write is in progress go out together (up to SSE_FLUSH_BYTES per write),
+# instead of one socket write per token. A frame is never held back waiting
+# for more, so upstream pauses don't leave the client with stale output.
+SSE_FLUSH_BYTES = 4096
+
+# Queued by _pump_stream after the last upstream frame
+_STREAM_END = object()
+
+# Admin settings read by every chat request, loaded together when not cached
+CHAT_SETTING_KEYS = (
+    'sensitive_info_filter_enabled',
+    'child_system_prompt',
+    'teen_system_prompt',
+    'distilled_context_enabled',
+)
+
+# Work the chat stream shouldn't wait for (distilled context summaries,
+# exact token counts) runs on a background pool, so the stream can close as
+# soon as the reply is saved. At most BACKGROUND_MAX_PENDING jobs are queued
+# or running; beyond that new ones are skipped (messages keep their full
+# content or their token estimate).
+BACKGROUND_WORKERS = 4
+BACKGROUND_MAX_PENDING = 32
+_background_executor = None
+_background_executor_lock = threading.Lock()
+_background_slots = threading.BoundedSemaphore(BACKGROUND_MAX_PENDING)
+
+
+def _get_background_executor() -> ThreadPoolExecutor:
+    """Create the background thread pool on first use"""
+    global _background_executor
+    if _background_executor is None:
+        with _background_executor_lock:
+            if _background_executor is None:
+                _background_executor = ThreadPoolExecutor(
+                    max_workers=BACKGROUND_WORKERS,
+                    thread_name_prefix='chat-background'
+                )
+    return _background_executor
+
 
 def _parse_distilled_summaries(summary_text: str) -> tuple:
     """
@@ -38,13 +115,12 @@ def _parse_distilled_summaries(summary_text: str) -> tuple:
     user_summary = ""
     assistant_summary = ""
 
-    lines = summary_text.strip().split('\n')
-    for line in lines:
-        line = line.strip()
-        if line.upper().startswith('USER:'):
-            user_summary = line[5:].strip()
-        elif line.upper().startswith('ASSISTANT:'):
-            assistant_summary = line[10:].strip()
+    # If a label appears more than once, the last line wins
+    for match in DISTILLED_SUMMARY_RE.finditer(summary_text):
+        if match.group('user') is not None:
+            user_summary = match.group('user').strip()
+        else:
+            assistant_summary = match.group('assistant').strip()
 
     # Fallback if parsing fails - use the whole response split in half
     if not user_summary and not assistant_summary:
@@ -55,14 +131,14 @@ def _parse_distilled_summaries(summary_text: str) -> tuple:
     return user_summary, assistant_summary
 
 
-def _generate_distilled_context(user_msg, bot_msg, user_message_content: str, bot_response: str,
+def _generate_distilled_context(user_msg_id: int, bot_msg_id: int, user_message_content: str, bot_response: str,
                                  model_provider: str, model_name, user_id: int, upload_folder: str):
     """
     Generate and store distilled summaries for user and bot messages.
 
     Args:
-        user_msg: The user Message object to update
-        bot_msg: The bot Message object to update
+        user_msg_id: ID of the user Message to update
+        bot_msg_id: ID of the bot Message to update
         user_message_content: The original user message content
         bot_response: The full bot response
         model_provider: The AI provider to use for summarization
@@ -74,25 +150,13 @@ def _generate_distilled_context(user_msg, bot_msg, user_message_content: str, bo
 
     try:
         # Strip thinking tags from bot response before summarization
-        cleaned_response = re.sub(r'<think>.*?</think>', '', bot_response, flags=re.DOTALL).strip()
-
-        # Truncate very long responses to avoid token limits in summarization
-        truncated_response = cleaned_response[:4000] if len(cleaned_response) > 4000 else cleaned_response
-        truncated_user = user_message_content[:2000] if len(user_message_content) > 2000 else user_message_content
+        cleaned_response = THINK_TAG_RE.sub('', bot_response).strip()
 
-        summarization_prompt = f"""Summarize the following conversation exchange. Be extremely brief - aim for 1-2 sentences each.
-
-IMPORTANT: Write summaries as direct statements, NOT descriptions of what was said.
-- WRONG: "The user asked about the capital" or "The assistant explained that..."
-- CORRECT: "What is the capital of France?" or "The capital of France is Paris."
-
-The user's message: {truncated_user}
-
-The response given: {truncated_response}
-
-Provide two ultra-brief summaries in this exact format:
-USER: [Restate the user's question/request directly]
-ASSISTANT: [State the key information from the response directly, as facts]"""
+        # Truncate very long texts to avoid token limits in summarization
+        summarization_prompt = DISTILLED_SUMMARY_PROMPT.format(
+            user_message=user_message_content[:2000],
+            response=cleaned_response[:4000]
+        )
 
         summary_result = AIService.get_response(
             messages=[{"role": "user", "content": summarization_prompt}],
@@ -104,17 +168,20 @@ ASSISTANT: [State the key information from the response directly, as facts]"""
 
         if summary_result.get('response'):
             # Strip any thinking tags from the summary response itself
-            summary_text = re.sub(r'<think>.*?</think>', '', summary_result['response'], flags=re.DOTALL).strip()
+            summary_text = THINK_TAG_RE.sub('', summary_result['response']).strip()
             user_summary, assistant_summary = _parse_distilled_summaries(summary_text)
 
-            # Update messages with distilled content
+            # Update messages with distilled content (one executemany by primary key)
+            updates = []
             if user_summary:
-                user_msg.distilled_content = user_summary
+                updates.append({'id': user_msg_id, 'distilled_content': user_summary})
             if assistant_summary:
-                bot_msg.distilled_content = assistant_summary
+                updates.append({'id': bot_msg_id, 'distilled_content': assistant_summary})
+            if updates:
+                db.session.execute(update(Message), updates)
 
             db.session.commit()
-            current_app.logger.info(f"Distilled context generated for messages {user_msg.id}, {bot_msg.id}")
+            current_app.logger.info(f"Distilled context generated for messages {user_msg_id}, {bot_msg_id}")
         else:
             current_app.logger.warning(f"Distilled context: No response from summarization")
 
@@ -123,6 +190,124 @@ ASSISTANT: [State the key information from the response directly, as facts]"""
         # Don't fail the main response - just log and continue
 
 
+def _count_message_tokens(message_id: int, content: str):
+    """
+    Replace a user message's token estimate with the exact count.
+
+    Args:
+        message_id: ID of the user message
+        content: The message text that was sent
+    """
+    from app.services.token_service import TokenService
+
+    try:
+        input_tokens = TokenService.count_tokens(content)
+        db.session.execute(
+            update(Message)
+            .where(Message.id == message_id)
+            .values(input_tokens=input_tokens, tokens_used=input_tokens)
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Token count for message {message_id} failed: {str(e)}")
+
+
+def _run_in_background(app, func, *args):
+    """Background job: run func in its own app context"""
+    try:
+        with app.app_context():
+            func(*args)
+    finally:
+        _background_slots.release()
+
+
+def _submit_background(func, *args) -> bool:
+    """
+    Queue func(*args) on the background pool.
+
+    Returns:
+        bool: False if the queue was full and the job was skipped
+    """
+    if not _background_slots.acquire(blocking=False):
+        current_app.logger.warning(f"Background queue is full, skipping {func.__name__}")
+        return False
+    try:
+        _get_background_executor().submit(_run_in_background, current_app._get_current_object(), func, *args)
+    except Exception:
+        _background_slots.release()
+        raise
+    return True
+
+
+def _pump_stream(app, chunks, frames: queue.SimpleQueue, stop: threading.Event):
+    """Background thread: read an upstream SSE generator into a queue"""
+    try:
+        with app.app_context():
+            try:
+                for chunk in chunks:
+                    if stop.is_set():
+                        break
+                    frames.put(chunk)
+            finally:
+                # Closes the provider connection if the client went away
+                chunks.close()
+    except Exception as e:
+        frames.put(e)
+    finally:
+        frames.put(_STREAM_END)
+
+
+def _stream_batches(chunks):
+    """
+    Read SSE frames from an upstream generator and yield them in batches.
+
+    The generator runs on its own thread, so frames keep arriving while the
+    previous batch is written to the client. Each batch is the next frame
+    plus whatever else has already arrived (up to SSE_FLUSH_BYTES).
+
+    Args:
+        chunks: Generator of SSE-formatted strings (AIService.get_response_stream)
+
+    Yields:
+        list: SSE frames to write together
+    """
+    frames = queue.SimpleQueue()
+    stop = threading.Event()
+    threading.Thread(
+        target=_pump_stream,
+        args=(current_app._get_current_object(), chunks, frames, stop),
+        name='chat-stream',
+        daemon=True
+    ).start()
+
+    try:
+        while True:
+            batch = []
+            batch_size = 0
+            item = frames.get()
+            while isinstance(item, str):
+                batch.append(item)
+                batch_size += len(item)
+                if batch_size >= SSE_FLUSH_BYTES:
+                    item = None
+                    break
+                try:
+                    item = frames.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if batch:
+                yield batch
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+    finally:
+        # Tell the reader thread to stop if the client disconnected
+        stop.set()
+
+
 @bp.route('/chat', methods=['POST'])
 @login_required
 @limiter.limit(rate_limit_chat)
@@ -145,8 +330,11 @@ def chat():
     if not message_content and not attachments_data:
         return jsonify({"error": "No message or attachments provided"}), 400
 
-    # Apply sensitive information filter if enabled
     from app.models.admin_settings import AdminSettings
+    # Load the admin settings read below with one query; no-op while they are cached
+    AdminSettings.get_settings_bulk(CHAT_SETTING_KEYS)
+
+    # Apply sensitive information filter if enabled
     if AdminSettings.is_sensitive_info_filter_enabled() and message_content:
         from app.services.sensitive_info_filter import SensitiveInfoFilter
         message_content = SensitiveInfoFilter.filter_message(message_content)
@@ -182,9 +370,10 @@ def chat():
         db.session.add(chat)
         db.session.commit()
 
-    # Count tokens for user message
+    # Quick token estimate for the user message; the exact count is taken on
+    # the background pool, so tokenizing never delays the stream
     from app.services.token_service import TokenService
-    user_input_tokens = TokenService.count_tokens(message_content) if message_content else 0
+    user_input_tokens = TokenService.approximate_tokens(message_content)
 
     # Save user message immediately
     user_msg = Message(
@@ -199,41 +388,65 @@ def chat():
     db.session.add(user_msg)
     db.session.flush()  # Get user_msg.id before creating attachments
 
-    # Save attachments if present
+    # Save attachments if present, as one bulk INSERT. The objects are not
+    # needed here; the history below reloads them with the messages.
     if attachments_data:
-        for att_data in attachments_data:
-            attachment = Attachment(
-                message_id=user_msg.id,
-                original_filename=att_data['original_filename'],
-                stored_filename=att_data['stored_filename'],
-                file_path=att_data['file_path'],
-                mime_type=att_data['mime_type'],
-                file_size=att_data['file_size'],
-                file_type=att_data['file_type']
-            )
-            db.session.add(attachment)
+        db.session.execute(insert(Attachment), [
+            {
+                'message_id': user_msg.id,
+                'original_filename': att_data['original_filename'],
+                'stored_filename': att_data['stored_filename'],
+                'file_path': att_data['file_path'],
+                'mime_type': att_data['mime_type'],
+                'file_size': att_data['file_size'],
+                'file_type': att_data['file_type']
+            }
+            for att_data in attachments_data
+        ])
 
     db.session.commit()
 
+    # Replace the estimate with the exact count, whether or not a reply follows
+    if message_content:
+        _submit_background(_count_message_tokens, user_msg.id, message_content)
+
     # Get chat history
     # Check if distilled context is enabled - use summaries instead of full content
     use_distilled_context = AdminSettings.is_distilled_context_enabled()
 
-    messages = []
-    for msg in chat.messages.all():
-        # Use distilled content if enabled AND available, otherwise use full content
-        if use_distilled_context and msg.distilled_content:
-            content = msg.distilled_content
-        else:
-            content = msg.content
+    # Use distilled content if enabled AND available, otherwise use full content.
+    # The choice is made in SQL, so full contents of summarized messages are
+    # never read, and only the columns needed for the prompt are selected.
+    if use_distilled_context:
+        content_column = type_coerce(
+            case((Message.distilled_content != '', Message.distilled_content), else_=Message.content),
+            CompressedText()
+        )
+    else:
+        content_column = Message.content
+    history = db.session.execute(
+        select(Message.id, Message.role, content_column)
+        .where(Message.chat_id == chat.id)
+        .order_by(Message.created_at)
+    ).all()
+
+    # Attachments for the whole chat in one query, grouped by message
+    attachments_by_message = {}
+    chat_attachments = Attachment.query.join(Message)\
+        .filter(Message.chat_id == chat.id)\
+        .order_by(Attachment.id)
+    for attachment in chat_attachments:
+        attachments_by_message.setdefault(attachment.message_id, []).append(attachment.to_dict())
 
+    messages = []
+    for msg_id, msg_role, content in history:
         msg_dict = {
-            "role": "assistant" if msg.role == "bot" or msg.role == "assistant" else "user",
+            "role": "assistant" if msg_role == "bot" or msg_role == "assistant" else "user",
             "content": content
         }
         # Include attachments for historical messages (not distilled)
-        if msg.attachments:
-            msg_dict["attachments"] = [att.to_dict() for att in msg.attachments]
+        if msg_id in attachments_by_message:
+            msg_dict["attachments"] = attachments_by_message[msg_id]
         messages.append(msg_dict)
 
     # RAG: Retrieve relevant document context if enabled
@@ -275,28 +488,31 @@ def chat():
         usage_data = None  # Will capture token usage from AI response
 
         try:
-            # Send session_id first
-            yield f"data: {json.dumps({'type': 'session_id', 'session_id': session_id})}\n\n"
-
-            # Send user message ID and token count so frontend can display
-            yield f"data: {json.dumps({'type': 'user_message_id', 'message_id': user_msg.id, 'input_tokens': user_input_tokens, 'tokens_estimated': True})}\n\n"
+            # Send session_id, then the user message ID and token count so
+            # frontend can display, in a single write
+            yield (
+                sse_event({'type': 'session_id', 'session_id': session_id}) +
+                sse_event({'type': 'user_message_id', 'message_id': user_msg.id, 'input_tokens': user_input_tokens, 'tokens_estimated': True})
+            )
 
             # Stream AI response (pass RAG context and age-based system prompt if available)
-            for chunk in AIService.get_response_stream(messages, model_provider, model_name, user_id, upload_folder, rag_context, age_system_prompt, local_vision_enabled):
-                # Parse the SSE chunk to get the JSON data
-                if chunk.startswith('data: '):
-                    chunk_data = json.loads(chunk[6:])
-
-                    # Track full content
-                    if chunk_data.get('type') == 'content':
-                        full_response += chunk_data.get('content', '')
-                    elif chunk_data.get('type') == 'done':
-                        full_response = chunk_data.get('full_content', full_response)
-                        # Capture usage data from the done event
-                        usage_data = chunk_data.get('usage')
-
-                # Forward the chunk to client
-                yield chunk
+            chunks = AIService.get_response_stream(messages, model_provider, model_name, user_id, upload_folder, rag_context, age_system_prompt, local_vision_enabled)
+            for batch in _stream_batches(chunks):
+                # Forward the frames to the client in one write
+                yield ''.join(batch)
+
+                for chunk in batch:
+                    # Parse the SSE chunk to get the JSON data
+                    if chunk.startswith('data: '):
+                        chunk_data = loads(chunk[6:])
+
+                        # Track full content
+                        if chunk_data.get('type') == 'content':
+                            full_response += chunk_data.get('content', '')
+                        elif chunk_data.get('type') == 'done':
+                            full_response = chunk_data.get('full_content', full_response)
+                            # Capture usage data from the done event
+                            usage_data = chunk_data.get('usage')
 
             # Save bot response to database after streaming completes
             if full_response:
@@ -324,26 +540,26 @@ def chat():
 
                 db.session.commit()
 
-                # Distilled Context: Generate summaries if enabled
-                from app.models.admin_settings import AdminSettings
-                if AdminSettings.is_distilled_context_enabled():
-                    _generate_distilled_context(
-                        user_msg=user_msg,
-                        bot_msg=bot_msg,
-                        user_message_content=message_content,
-                        bot_response=full_response,
-                        model_provider=model_provider,
-                        model_name=model_name,
-                        user_id=user_id,
-                        upload_folder=upload_folder
+                # Distilled Context: Generate summaries in the background if enabled
+                if use_distilled_context:
+                    _submit_background(
+                        _generate_distilled_context,
+                        user_msg.id,
+                        bot_msg.id,
+                        message_content,
+                        full_response,
+                        model_provider,
+                        model_name,
+                        user_id,
+                        upload_folder
                     )
 
                 # Send bot message ID and token count so frontend can display
-                yield f"data: {json.dumps({'type': 'bot_message_id', 'message_id': bot_msg.id, 'output_tokens': output_tokens, 'tokens_estimated': tokens_estimated})}\n\n"
+                yield sse_event({'type': 'bot_message_id', 'message_id': bot_msg.id, 'output_tokens': output_tokens, 'tokens_estimated': tokens_estimated})
 
         except Exception as e:
             current_app.logger.error(f"Streaming error: {str(e)}", exc_info=True)
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Error: {str(e)}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Error: {str(e)}'})
 
     return Response(
         stream_with_context(generate()),
@@ -373,7 +589,7 @@ def get_history():
     if chat.user_id != current_user.id:
         return jsonify({"error": "Unauthorized"}), 403
 
-    history = [msg.to_dict() for msg in chat.messages.all()]
+    history = [msg.to_dict() for msg in chat.get_messages()]
     return jsonify(history)
 
 
@@ -390,8 +606,8 @@ def get_sessions():
             "session_id": chat.session_id,
             "name": chat.name,
             "model_provider": chat.model_provider,
-            "created_at": chat.created_at.isoformat() + 'Z' if chat.created_at else None,
-            "updated_at": chat.updated_at.isoformat() + 'Z' if chat.updated_at else None
+            "created_at": iso_z(chat.created_at),
+            "updated_at": iso_z(chat.updated_at)
         }
         for chat in chats
     ]
@@ -421,7 +637,7 @@ def delete_chat(session_id):
         failed_files = 0
 
         # Get all messages in the chat
-        messages = chat.messages.all()
+        messages = chat.messages
 
         # For each message, delete all attachment files
         for message in messages:
@@ -526,49 +742,10 @@ def export_chat(session_id):
 
     try:
         # Build the text content
-        from datetime import datetime
-        import io
-
-        output = io.StringIO()
-
-        # Write header
-        output.write(f"Chat Export: {chat.name}\n")
-        output.write(f"Exported on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n")
-        output.write(f"Model: {chat.model_provider or 'Unknown'}\n")
-        output.write("=" * 80 + "\n\n")
-
-        # Write messages
-        messages = chat.messages.order_by(Message.created_at).all()
-
-        for message in messages:
-            # Format timestamp
-            timestamp = message.created_at.strftime('%Y-%m-%d %H:%M:%S')
-
-            # Format role
-            role = "You" if message.role == "user" else message.model_used or "Assistant"
-
-            # Write message header
-            output.write(f"[{timestamp}] {role}:\n")
-
-            # Write content (excluding attachments - text only)
-            # Remove thinking tags if present
-            content = message.content
-            if message.role in ['bot', 'assistant']:
-                # Remove thinking content from export
-                import re
-                content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
-
-            output.write(f"{content}\n")
-
-            # Add separator between messages
-            output.write("\n" + "-" * 80 + "\n\n")
-
-        # Get the text content
-        text_content = output.getvalue()
-        output.close()
+        text_content = _format_chat_export(chat)
 
         # Create a file-like object for send_file
-        file_obj = io.BytesIO(text_content.encode('utf-8'))
+        file_obj = io.BytesIO(text_content)
 
         # Generate filename
         safe_filename = "".join(c for c in chat.name if c.isalnum() or c in (' ', '-', '_')).strip()
@@ -587,83 +764,118 @@ def export_chat(session_id):
         return jsonify({"error": f"Failed to export chat: {str(e)}"}), 500
 
 
-@bp.route('/export_all_chats', methods=['GET'])
-@login_required
-def export_all_chats():
-    """Export all chat sessions for the authenticated user as a zip file"""
-    try:
-        # Get all non-deleted chats for the current user
-        chats = Chat.query.filter_by(user_id=current_user.id, is_deleted=False).order_by(Chat.updated_at.desc()).all()
+def _format_chat_export(chat) -> bytes:
+    """
+    Render a chat as the plain-text export (text only, thinking blocks
+    removed). Lines are collected in a list and joined once.
 
-        if not chats:
-            return jsonify({"error": "No chats to export"}), 404
+    Args:
+        chat: Chat to export, with its messages
 
-        # Create a BytesIO buffer for the zip file
-        zip_buffer = io.BytesIO()
+    Returns:
+        bytes: UTF-8 encoded export text
+    """
+    separator = "\n" + "-" * 80 + "\n\n"
+
+    # Header
+    parts = [
+        f"Chat Export: {chat.name}\n",
+        f"Exported on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n",
+        f"Model: {chat.model_provider or 'Unknown'}\n",
+        "=" * 80 + "\n\n",
+    ]
 
-        # Create zip file
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for chat in chats:
-                # Build text content for each chat
-                output = io.StringIO()
+    for message in chat.messages:
+        # Format timestamp
+        timestamp = message.created_at.strftime('%Y-%m-%d %H:%M:%S')
 
-                # Write header
-                output.write(f"Chat Export: {chat.name}\n")
-                output.write(f"Exported on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n")
-                output.write(f"Model: {chat.model_provider or 'Unknown'}\n")
-                output.write("=" * 80 + "\n\n")
+        # Format role
+        role = "You" if message.role == "user" else message.model_used or "Assistant"
 
-                # Write messages
-                messages = chat.messages.order_by(Message.created_at).all()
+        # Remove thinking content from bot replies
+        content = message.content
+        if message.role in ['bot', 'assistant']:
+            content = THINK_TAG_RE.sub('', content).strip()
 
-                for message in messages:
-                    # Format timestamp
-                    timestamp = message.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        parts.append(f"[{timestamp}] {role}:\n{content}\n")
+        parts.append(separator)
 
-                    # Format role
-                    role = "You" if message.role == "user" else message.model_used or "Assistant"
+    return "".join(parts).encode('utf-8')
 
-                    # Write message header
-                    output.write(f"[{timestamp}] {role}:\n")
 
-                    # Write content (excluding thinking tags)
-                    content = message.content
-                    if message.role in ['bot', 'assistant']:
-                        # Remove thinking content from export
-                        content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
+class _ZipStreamBuffer:
+    """
+    Write-only file object for building a zip archive while it is sent.
+    It has no seek/tell, so zipfile writes each entry's sizes after its
+    data instead of seeking back; drain() hands over what has been
+    written since the last call.
+    """
 
-                    output.write(f"{content}\n")
+    def __init__(self):
+        self._chunks = []
 
-                    # Add separator between messages
-                    output.write("\n" + "-" * 80 + "\n\n")
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
 
-                # Get the text content
-                text_content = output.getvalue()
-                output.close()
+    def flush(self):
+        pass
 
-                # Generate safe filename for this chat
-                safe_filename = "".join(c for c in chat.name if c.isalnum() or c in (' ', '-', '_')).strip()
-                safe_filename = safe_filename[:50]  # Limit length
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
 
-                # Add index number to ensure uniqueness
-                chat_index = chats.index(chat) + 1
-                filename = f"{chat_index:03d}_{safe_filename}.txt"
 
-                # Add file to zip
-                zip_file.writestr(filename, text_content.encode('utf-8'))
+@bp.route('/export_all_chats', methods=['GET'])
+@login_required
+def export_all_chats():
+    """Export all chat sessions for the authenticated user as a zip file"""
+    try:
+        # Get all non-deleted chats for the current user, with every chat's
+        # messages in one extra query (attachments are not exported)
+        chats = Chat.query.options(selectinload(Chat.messages).lazyload(Message.attachments))\
+            .filter_by(user_id=current_user.id, is_deleted=False)\
+            .order_by(Chat.updated_at.desc())\
+            .all()
 
-        # Seek to beginning of the buffer
-        zip_buffer.seek(0)
+        if not chats:
+            return jsonify({"error": "No chats to export"}), 404
 
         # Generate zip filename with timestamp
         timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
         zip_filename = f"Exported_Chats_{timestamp}.zip"
 
-        return send_file(
-            zip_buffer,
+        def generate():
+            buffer = _ZipStreamBuffer()
+            try:
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                    for chat_index, chat in enumerate(chats, start=1):
+                        # Build text content for each chat
+                        text_content = _format_chat_export(chat)
+
+                        # Generate safe filename for this chat
+                        safe_filename = "".join(c for c in chat.name if c.isalnum() or c in (' ', '-', '_')).strip()
+                        safe_filename = safe_filename[:50]  # Limit length
+
+                        # Add index number to ensure uniqueness
+                        filename = f"{chat_index:03d}_{safe_filename}.txt"
+
+                        # Add file to zip and send it on right away
+                        zip_file.writestr(filename, text_content)
+                        yield buffer.drain()
+
+                # Central directory, written when the archive is closed
+                yield buffer.drain()
+
+            except Exception as e:
+                # Headers are already sent; the client gets a truncated archive
+                current_app.logger.error(f"Error streaming chat export: {str(e)}", exc_info=True)
+
+        return Response(
+            stream_with_context(generate()),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=zip_filename
+            headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
         )
 
     except Exception as e:
@@ -986,6 +1198,7 @@ def update_model_visibility(model_id):
 
         model.is_enabled = bool(data['is_enabled'])
         db.session.commit()
+        ModelVisibility.clear_cache()
 
         return jsonify({
             "status": "success",
@@ -1050,7 +1263,7 @@ def get_admin_setting(setting_key):
 
     try:
         from app.models.admin_settings import AdminSettings
-        setting = AdminSettings.query.filter_by(setting_key=setting_key).first()
+        setting = AdminSettings.get_by_key(setting_key)
 
         if not setting:
             return jsonify({"error": "Setting not found"}), 404
@@ -1081,7 +1294,7 @@ def update_admin_setting(setting_key):
             return jsonify({"error": "value field is required"}), 400
 
         # Get or create the setting
-        setting = AdminSettings.query.filter_by(setting_key=setting_key).first()
+        setting = AdminSettings.get_by_key(setting_key)
 
         if not setting:
             # Create new setting if it doesn't exist
@@ -1098,6 +1311,10 @@ def update_admin_setting(setting_key):
         # Update the value
         setting.set_typed_value(data['value'])
         db.session.commit()
+        AdminSettings.clear_cache(setting_key)
+
+        if setting_key.startswith('rate_limit_'):
+            refresh_rate_limits(current_app._get_current_object())
 
         return jsonify({
             "status": "success",
@@ -1154,18 +1371,17 @@ def update_rate_limits():
         updated = []
         errors = []
 
+        # Validate everything first, then write all settings in one commit
+        items = {}
+        setting_types = {}
+        descriptions = {}
+
         # Handle enabled toggle
         if 'enabled' in data:
-            try:
-                AdminSettings.set_setting(
-                    key='rate_limit_enabled',
-                    value=bool(data['enabled']),
-                    setting_type='boolean',
-                    description='Enable rate limiting for all endpoints'
-                )
-                updated.append('enabled')
-            except Exception as e:
-                errors.append(f"Failed to update enabled: {str(e)}")
+            items['rate_limit_enabled'] = bool(data['enabled'])
+            setting_types['rate_limit_enabled'] = 'boolean'
+            descriptions['rate_limit_enabled'] = 'Enable rate limiting for all endpoints'
+            updated.append('enabled')
 
         # Handle individual rate limits
         for limit_name in AdminSettings.DEFAULT_RATE_LIMITS.keys():
@@ -1178,11 +1394,24 @@ def update_rate_limits():
                     if value > 10000:
                         errors.append(f"{limit_name}: Value cannot exceed 10000")
                         continue
-                    AdminSettings.set_rate_limit(limit_name, value)
+                    setting_key = f'rate_limit_{limit_name}'
+                    items[setting_key] = value
+                    setting_types[setting_key] = 'integer'
+                    descriptions[setting_key] = f'Rate limit for {limit_name}'
                     updated.append(limit_name)
                 except (ValueError, TypeError):
                     errors.append(f"{limit_name}: Invalid value")
 
+        if items:
+            try:
+                AdminSettings.set_settings_bulk(items, setting_types=setting_types, descriptions=descriptions)
+            except Exception as e:
+                errors.append(f"Failed to update rate limits: {str(e)}")
+                updated = []
+
+        if updated:
+            refresh_rate_limits(current_app._get_current_object())
+
         if errors and not updated:
             return jsonify({"error": "Failed to update rate limits", "details": errors}), 400
 
@@ -1225,7 +1454,7 @@ def _fetch_ollama_models(base_url):
     # Convert chat URL to tags URL
     tags_url = base_url.replace('/api/chat', '').rstrip('/') + '/api/tags'
 
-    response = http_requests.get(tags_url, timeout=5)
+    response = get_session().get(tags_url, timeout=5)
     response.raise_for_status()
     data = response.json()
 
@@ -1245,7 +1474,7 @@ def _fetch_lm_studio_models(base_url):
     # Convert chat URL to models URL
     models_url = base_url.replace('/v1/chat/completions', '').rstrip('/') + '/v1/models'
 
-    response = http_requests.get(models_url, timeout=5)
+    response = get_session().get(models_url, timeout=5)
     response.raise_for_status()
     data = response.json()
 
@@ -1262,7 +1491,7 @@ def _fetch_lm_studio_models(base_url):
 
 def _fetch_openai_models(api_key):
     """Fetch models from OpenAI API."""
-    response = http_requests.get(
+    response = get_session().get(
         'https://api.openai.com/v1/models',
         headers={'Authorization': f'Bearer {api_key}'},
         timeout=10
@@ -1286,7 +1515,7 @@ def _fetch_openai_models(api_key):
 
 def _fetch_anthropic_models(api_key):
     """Fetch models from Anthropic API."""
-    response = http_requests.get(
+    response = get_session().get(
         'https://api.anthropic.com/v1/models',
         headers={
             'x-api-key': api_key,
@@ -1311,7 +1540,7 @@ def _fetch_anthropic_models(api_key):
 
 def _fetch_gemini_models(api_key):
     """Fetch models from Gemini API."""
-    response = http_requests.get(
+    response = get_session().get(
         f'https://generativelanguage.googleapis.com/v1beta/models?key={api_key}',
         timeout=10
     )
@@ -1337,7 +1566,7 @@ def _fetch_gemini_models(api_key):
 
 def _fetch_xai_models(api_key):
     """Fetch models from xAI API (OpenAI-compatible)."""
-    response = http_requests.get(
+    response = get_session().get(
         'https://api.x.ai/v1/models',
         headers={'Authorization': f'Bearer {api_key}'},
         timeout=10
@@ -1843,7 +2072,7 @@ Remember: Output ONLY the improved prompt text. Nothing else."""
             return jsonify({"error": result['error']}), 500
 
         # Strip thinking tags from reasoning models before returning
-        improved = re.sub(r'<think>.*?</think>', '', result.get('response', ''), flags=re.DOTALL).strip()
+        improved = THINK_TAG_RE.sub('', result.get('response', '')).strip()
 
         return jsonify({
             "status": "success",
@@ -1,13 +1,19 @@
 from flask import Blueprint, render_template, jsonify, request, send_from_directory, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
 from app.models.chat import Chat
 from app.models.user import User
 from app.models.attachment import Attachment
 from app import db
+from app.utils.auth import validate_session_token
+from app.utils.json_utils import iso_z
 import os
 
 bp = Blueprint('main', __name__)
 
+# Single session enforcement for every route in this blueprint
+bp.before_request(validate_session_token)
+
 
 @bp.route('/')
 @login_required
@@ -153,7 +159,10 @@ def get_all_users():
 
     try:
         # Get all users except the current user (can't delete yourself)
-        users = User.query.filter(User.id != current_user.id).order_by(User.created_at.desc()).all()
+        users = User.query.options(selectinload(User.roles))\
+            .filter(User.id != current_user.id)\
+            .order_by(User.created_at.desc())\
+            .all()
 
         users_list = []
         for user in users:
@@ -164,8 +173,8 @@ def get_all_users():
                 'id': user.id,
                 'username': user.username,
                 'email': user.email,
-                'created_at': user.created_at.isoformat() + 'Z' if user.created_at else None,
-                'last_login': user.last_login.isoformat() + 'Z' if user.last_login else None,
+                'created_at': iso_z(user.created_at),
+                'last_login': iso_z(user.last_login),
                 'is_active': user.is_active,
                 'roles': [role.name for role in user.roles],
                 'chat_count': chat_count,
@@ -197,18 +206,17 @@ def delete_user(user_id):
 
     try:
         # Find the user to delete
-        user_to_delete = User.query.get(user_id)
+        user_to_delete = db.session.get(User, user_id)
         if not user_to_delete:
             return jsonify({'error': 'User not found'}), 404
 
         # Get all chats and their associated files before deletion
-        chats = Chat.query.filter_by(user_id=user_id).all()
+        # Messages for every chat are batch-loaded in one extra query
+        chats = Chat.query.options(selectinload(Chat.messages)).filter_by(user_id=user_id).all()
         files_to_delete = []
 
         for chat in chats:
-            # Get all messages in this chat
-            messages = chat.messages.all()
-            for message in messages:
+            for message in chat.messages:
                 # Get all attachments in this message
                 for attachment in message.attachments:
                     # Build full file path
@@ -219,6 +227,7 @@ def delete_user(user_id):
         # Delete the user (cascade will handle chats, messages, attachments records)
         db.session.delete(user_to_delete)
         db.session.commit()
+        User.clear_user_limit_cache()
 
         # Delete physical files
         deleted_files = 0
@@ -7,6 +7,8 @@ from flask import current_app
 from typing import List, Dict, Any, Optional, Generator
 from google import genai
 from google.genai import types
+from app.utils.http_client import get_session
+from app.utils.json_utils import sse_event
 
 
 class AIService:
@@ -293,7 +295,7 @@ class AIService:
         """Stream response from Google Gemini API with vision support"""
         api_key = AIService._get_user_api_key('gemini', user_id)
         if not api_key:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Gemini API key not configured. Please add your API key in your application settings.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Gemini API key not configured. Please add your API key in your application settings.'})
             return
 
         # Get model ID from AdminSettings (system-level)
@@ -373,7 +375,7 @@ class AIService:
                 if chunk.text:
                     full_content += chunk.text
                     # Yield SSE-formatted chunk
-                    yield f"data: {json.dumps({'type': 'content', 'content': chunk.text})}\n\n"
+                    yield sse_event({'type': 'content', 'content': chunk.text})
 
             # Try to get usage metadata from the last chunk
             if last_chunk and hasattr(last_chunk, 'usage_metadata') and last_chunk.usage_metadata:
@@ -402,19 +404,19 @@ class AIService:
             done_data = {'type': 'done', 'full_content': full_content}
             if usage_data:
                 done_data['usage'] = usage_data
-            yield f"data: {json.dumps(done_data)}\n\n"
+            yield sse_event(done_data)
 
         except Exception as e:
             error_message = str(e)
             # Handle common errors
             if "API_KEY_INVALID" in error_message or "invalid_api_key" in error_message.lower():
-                yield f"data: {json.dumps({'type': 'error', 'content': 'Invalid Gemini API key. Please check your API key in application settings.'})}\n\n"
+                yield sse_event({'type': 'error', 'content': 'Invalid Gemini API key. Please check your API key in application settings.'})
             elif "quota" in error_message.lower():
-                yield f"data: {json.dumps({'type': 'error', 'content': 'Gemini API quota exceeded. Please check your API usage.'})}\n\n"
+                yield sse_event({'type': 'error', 'content': 'Gemini API quota exceeded. Please check your API usage.'})
             elif "timeout" in error_message.lower():
-                yield f"data: {json.dumps({'type': 'error', 'content': 'Request to Gemini API timed out'})}\n\n"
+                yield sse_event({'type': 'error', 'content': 'Request to Gemini API timed out'})
             else:
-                yield f"data: {json.dumps({'type': 'error', 'content': f'Error communicating with Gemini API: {error_message}'})}\n\n"
+                yield sse_event({'type': 'error', 'content': f'Error communicating with Gemini API: {error_message}'})
 
     @staticmethod
     def _get_openai_response(messages: List[Dict[str, Any]], model_name: Optional[str] = None,
@@ -487,7 +489,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.openai.com/v1/chat/completions",
                 json=payload,
                 headers={
@@ -522,7 +524,7 @@ class AIService:
         """Stream response from OpenAI API with vision support"""
         api_key = AIService._get_user_api_key('openai', user_id)
         if not api_key:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'OpenAI API key not configured. Please add your API key in your application settings.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'OpenAI API key not configured. Please add your API key in your application settings.'})
             return
 
         # Get model ID from AdminSettings (system-level)
@@ -578,7 +580,7 @@ class AIService:
 
         # Check if model supports vision when images are present
         if has_images and not any(x in model_name.lower() for x in ['gpt-4', 'gpt-5', 'vision']):
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Model {model_name} does not support image inputs. Please use a vision-capable model.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Model {model_name} does not support image inputs. Please use a vision-capable model.'})
             return
 
         payload = {
@@ -589,7 +591,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.openai.com/v1/chat/completions",
                 json=payload,
                 headers={
@@ -632,7 +634,7 @@ class AIService:
                                 if content:  # Only process if content is not None or empty
                                     full_content += content
                                     # Yield SSE-formatted chunk
-                                    yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+                                    yield sse_event({'type': 'content', 'content': content})
                         except json.JSONDecodeError:
                             continue
 
@@ -658,17 +660,17 @@ class AIService:
 
             if usage_data:
                 done_data['usage'] = usage_data
-            yield f"data: {json.dumps(done_data)}\n\n"
+            yield sse_event(done_data)
 
         except requests.exceptions.HTTPError as http_err:
             error_msg = f"OpenAI API HTTP Error {response.status_code}: {http_err}"
-            yield f"data: {json.dumps({'type': 'error', 'content': error_msg})}\n\n"
+            yield sse_event({'type': 'error', 'content': error_msg})
         except requests.exceptions.ConnectionError:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Connection Error to OpenAI API'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Connection Error to OpenAI API'})
         except requests.exceptions.Timeout:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Request to OpenAI API timed out'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Request to OpenAI API timed out'})
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Error communicating with OpenAI API: {str(e)}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Error communicating with OpenAI API: {str(e)}'})
 
     @staticmethod
     def _get_anthropic_response(messages: List[Dict[str, Any]], model_name: Optional[str] = None,
@@ -754,7 +756,7 @@ class AIService:
             payload["system"] = system_message
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.anthropic.com/v1/messages",
                 json=payload,
                 headers={
@@ -788,7 +790,7 @@ class AIService:
         """Stream response from Anthropic Claude API with vision and PDF support"""
         api_key = AIService._get_user_api_key('anthropic', user_id)
         if not api_key:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Anthropic API key not configured. Please add your API key in your application settings.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Anthropic API key not configured. Please add your API key in your application settings.'})
             return
 
         # Get model ID from AdminSettings (system-level)
@@ -865,7 +867,7 @@ class AIService:
             payload["system"] = system_message
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.anthropic.com/v1/messages",
                 json=payload,
                 headers={
@@ -899,7 +901,7 @@ class AIService:
                                     content = delta.get('text', '')
                                     full_content += content
                                     # Yield SSE-formatted chunk
-                                    yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+                                    yield sse_event({'type': 'content', 'content': content})
 
                             elif event_type == 'message_delta':
                                 # Capture usage data from message_delta event (sent at end)
@@ -960,17 +962,17 @@ class AIService:
             done_data = {'type': 'done', 'full_content': full_content}
             if usage_data:
                 done_data['usage'] = usage_data
-            yield f"data: {json.dumps(done_data)}\n\n"
+            yield sse_event(done_data)
 
         except requests.exceptions.HTTPError as http_err:
             error_msg = f"Anthropic API HTTP Error {response.status_code}: {http_err}"
-            yield f"data: {json.dumps({'type': 'error', 'content': error_msg})}\n\n"
+            yield sse_event({'type': 'error', 'content': error_msg})
         except requests.exceptions.ConnectionError:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Connection Error to Anthropic API'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Connection Error to Anthropic API'})
         except requests.exceptions.Timeout:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Request to Anthropic API timed out'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Request to Anthropic API timed out'})
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Error communicating with Anthropic API: {str(e)}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Error communicating with Anthropic API: {str(e)}'})
 
     @staticmethod
     def _get_grok_response(messages: List[Dict[str, Any]], model_name: Optional[str] = None,
@@ -1037,7 +1039,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.x.ai/v1/chat/completions",
                 json=payload,
                 headers={
@@ -1075,7 +1077,7 @@ class AIService:
         """Stream response from xAI Grok API with vision support using HTTP API"""
         api_key = AIService._get_user_api_key('xai', user_id)
         if not api_key:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'xAI API key not configured. Please add your API key in your application settings.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'xAI API key not configured. Please add your API key in your application settings.'})
             return
 
         # Get model ID from AdminSettings (system-level)
@@ -1136,7 +1138,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 "https://api.x.ai/v1/chat/completions",
                 json=payload,
                 headers={
@@ -1179,7 +1181,7 @@ class AIService:
                                     content = delta['content']
                                     full_content += content
                                     # Yield SSE-formatted chunk
-                                    yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+                                    yield sse_event({'type': 'content', 'content': content})
                         except json.JSONDecodeError:
                             continue
 
@@ -1205,18 +1207,18 @@ class AIService:
             done_data = {'type': 'done', 'full_content': full_content}
             if usage_data:
                 done_data['usage'] = usage_data
-            yield f"data: {json.dumps(done_data)}\n\n"
+            yield sse_event(done_data)
 
         except requests.exceptions.HTTPError as http_err:
             error_msg = f"xAI API HTTP Error {response.status_code}: {http_err}"
-            yield f"data: {json.dumps({'type': 'error', 'content': error_msg})}\n\n"
+            yield sse_event({'type': 'error', 'content': error_msg})
         except requests.exceptions.ConnectionError:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Connection Error to xAI API'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Connection Error to xAI API'})
         except requests.exceptions.Timeout:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Request to xAI API timed out'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Request to xAI API timed out'})
         except Exception as e:
             current_app.logger.error(f"xAI API streaming error: {str(e)}")
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Error communicating with xAI API: {str(e)}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Error communicating with xAI API: {str(e)}'})
 
     @staticmethod
     def _get_lmstudio_response(messages: List[Dict[str, Any]], model_name: Optional[str] = None,
@@ -1305,7 +1307,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(lm_studio_url, json=payload, timeout=60)
+            response = get_session().post(lm_studio_url, json=payload, timeout=60)
             response.raise_for_status()
             data = response.json()
 
@@ -1353,7 +1355,7 @@ class AIService:
 
         # Block images if vision is not enabled
         if has_images and not vision_enabled:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Enable vision support using the eye icon button next to attachments if using a vision-capable model.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Enable vision support using the eye icon button next to attachments if using a vision-capable model.'})
             return
 
         # Convert messages - with optional vision support (OpenAI-compatible format)
@@ -1412,7 +1414,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(lm_studio_url, json=payload, timeout=120, stream=True)
+            response = get_session().post(lm_studio_url, json=payload, timeout=120, stream=True)
             response.raise_for_status()
 
             full_content = ""
@@ -1445,7 +1447,7 @@ class AIService:
                                 if 'content' in delta:
                                     content = delta['content']
                                     full_content += content
-                                    yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+                                    yield sse_event({'type': 'content', 'content': content})
                         except json.JSONDecodeError:
                             continue
 
@@ -1471,16 +1473,16 @@ class AIService:
             done_data = {'type': 'done', 'full_content': full_content}
             if usage_data:
                 done_data['usage'] = usage_data
-            yield f"data: {json.dumps(done_data)}\n\n"
+            yield sse_event(done_data)
 
         except requests.exceptions.ConnectionError:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Connection Error to LM Studio: Please ensure LM Studio is running at {lm_studio_url}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Connection Error to LM Studio: Please ensure LM Studio is running at {lm_studio_url}'})
         except requests.exceptions.HTTPError as http_err:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'LM Studio HTTP Error: {http_err}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'LM Studio HTTP Error: {http_err}'})
         except requests.exceptions.Timeout:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Request to LM Studio timed out'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Request to LM Studio timed out'})
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Error communicating with LM Studio: {str(e)}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Error communicating with LM Studio: {str(e)}'})
 
     @staticmethod
     def _get_ollama_response(messages: List[Dict[str, Any]], model_name: Optional[str] = None,
@@ -1548,7 +1550,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(ollama_url, json=payload, timeout=60)
+            response = get_session().post(ollama_url, json=payload, timeout=60)
             response.raise_for_status()
             data = response.json()
 
@@ -1594,7 +1596,7 @@ class AIService:
 
         # Block images if vision is not enabled
         if has_images and not vision_enabled:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Enable vision support using the eye icon button next to attachments if using a vision-capable model.'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Enable vision support using the eye icon button next to attachments if using a vision-capable model.'})
             return
 
         # Convert messages - with optional vision support (Ollama format)
@@ -1632,7 +1634,7 @@ class AIService:
         }
 
         try:
-            response = requests.post(ollama_url, json=payload, timeout=120, stream=True)
+            response = get_session().post(ollama_url, json=payload, timeout=120, stream=True)
             response.raise_for_status()
 
             full_content = ""
@@ -1646,7 +1648,7 @@ class AIService:
                         if 'message' in chunk_data and 'content' in chunk_data['message']:
                             content = chunk_data['message']['content']
                             full_content += content
-                            yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+                            yield sse_event({'type': 'content', 'content': content})
 
                         # Check if done - Ollama may provide token counts in final chunk
                         if chunk_data.get('done', False):
@@ -1682,16 +1684,16 @@ class AIService:
             done_data = {'type': 'done', 'full_content': full_content}
             if usage_data:
                 done_data['usage'] = usage_data
-            yield f"data: {json.dumps(done_data)}\n\n"
+            yield sse_event(done_data)
 
         except requests.exceptions.ConnectionError:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Connection Error to Ollama: Please ensure Ollama is running at {ollama_url}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Connection Error to Ollama: Please ensure Ollama is running at {ollama_url}'})
         except requests.exceptions.HTTPError as http_err:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Ollama HTTP Error: {http_err}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Ollama HTTP Error: {http_err}'})
         except requests.exceptions.Timeout:
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Request to Ollama timed out'})}\n\n"
+            yield sse_event({'type': 'error', 'content': 'Request to Ollama timed out'})
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': f'Error communicating with Ollama: {str(e)}'})}\n\n"
+            yield sse_event({'type': 'error', 'content': f'Error communicating with Ollama: {str(e)}'})
 
     @staticmethod
     def get_response_stream(messages: List[Dict[str, Any]], provider: str, model_name: Optional[str] = None,
@@ -1760,10 +1762,10 @@ class AIService:
             elif provider == 'ollama':
                 yield from AIService._get_ollama_response_stream(messages, model_name, user_id, upload_folder, local_vision_enabled)
             else:
-                yield f"data: {json.dumps({'type': 'error', 'content': f'Unknown provider: {provider}'})}\n\n"
+                yield sse_event({'type': 'error', 'content': f'Unknown provider: {provider}'})
         except Exception as e:
             current_app.logger.error(f"Streaming error for provider {provider}: {str(e)}", exc_info=True)
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'content': str(e)})
 
     @staticmethod
     def convert_messages_for_provider(messages: List[Dict[str, Any]], provider: str) -> List[Dict[str, Any]]:
@@ -7,6 +7,8 @@ import logging
 import requests
 from typing import Optional
 
+from app.utils.http_client import get_session
+
 logger = logging.getLogger(__name__)
 
 
@@ -257,7 +259,7 @@ class EmbeddingService:
             }
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 'https://api.openai.com/v1/embeddings',
                 headers={
                     'Authorization': f'Bearer {api_key}',
@@ -319,7 +321,7 @@ class EmbeddingService:
             }
 
         try:
-            response = requests.post(
+            response = get_session().post(
                 'https://api.openai.com/v1/embeddings',
                 headers={
                     'Authorization': f'Bearer {api_key}',
@@ -9,6 +9,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+from sqlalchemy import select
+
 from app import db
 from app.models.document import Document, DocumentChunk
 from app.models.admin_settings import AdminSettings
@@ -33,7 +35,7 @@ class RAGService:
     def is_enabled() -> bool:
         """Check if RAG is enabled globally."""
         try:
-            setting = AdminSettings.query.filter_by(setting_key='rag_enabled').first()
+            setting = AdminSettings.get_by_key('rag_enabled')
             if setting:
                 return setting.setting_value.lower() == 'true'
             return True  # Default to enabled
@@ -56,7 +58,7 @@ class RAGService:
         try:
             settings = {}
             for key, default in defaults.items():
-                setting = AdminSettings.query.filter_by(setting_key=key).first()
+                setting = AdminSettings.get_by_key(key)
                 if setting:
                     # Convert based on type
                     if setting.setting_type == 'boolean':
@@ -99,7 +101,7 @@ class RAGService:
                 - error: Error message if failed
         """
         # Get document
-        document = Document.query.get(document_id)
+        document = db.session.get(Document, document_id)
         if not document:
             return {
                 'success': False,
@@ -336,23 +338,28 @@ class RAGService:
             # Filter by minimum score
             filtered_results = [r for r in results if r.get('similarity', 0) >= min_score]
 
+            # Look up document names for all results in one query
+            doc_ids = {
+                r.get('metadata', {}).get('document_id') for r in filtered_results
+            }
+            doc_ids.discard(None)
+            doc_names = {}
+            if doc_ids:
+                doc_names = dict(db.session.execute(
+                    select(Document.id, Document.original_filename)
+                    .where(Document.id.in_(doc_ids))
+                ).all())
+
             # Enrich with document information
             enriched_results = []
             for result in filtered_results:
                 metadata = result.get('metadata', {})
                 doc_id = metadata.get('document_id')
 
-                # Get document name
-                doc_name = None
-                if doc_id:
-                    document = Document.query.get(doc_id)
-                    if document:
-                        doc_name = document.original_filename
-
                 enriched_results.append({
                     'content': result.get('content', ''),
                     'document_id': doc_id,
-                    'document_name': doc_name,
+                    'document_name': doc_names.get(doc_id),
                     'chunk_index': metadata.get('chunk_index'),
                     'page_number': metadata.get('page_number'),
                     'similarity': result.get('similarity', 0),
@@ -413,7 +420,7 @@ class RAGService:
                 - success: bool
                 - error: Error message if failed
         """
-        document = Document.query.get(document_id)
+        document = db.session.get(Document, document_id)
         if not document:
             return {'success': False, 'error': 'Document not found'}
 
@@ -460,9 +467,7 @@ class RAGService:
             if project_id is not None:
                 query = query.filter_by(project_id=project_id)
 
-            documents = query.order_by(Document.created_at.desc()).all()
-
-            return [doc.to_dict() for doc in documents]
+            return Document.serialize_many(query.order_by(Document.created_at.desc()))
 
         except Exception as e:
             logger.error(f"Error getting user documents: {str(e)}")
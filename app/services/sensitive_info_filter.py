@@ -184,6 +184,9 @@ class SensitiveInfoFilter:
         """
         Filter sensitive information from text.
 
+        Patterns are applied in order, each to the output of the previous
+        one, with a single regex pass per pattern.
+
         Args:
             text: The text to filter
             verbose: If True, return list of detected patterns
@@ -197,21 +200,21 @@ class SensitiveInfoFilter:
         filtered_text = text
         detected_patterns = []
 
-        for pattern_name, (pattern, replacement) in SensitiveInfoFilter.PATTERNS.items():
-            matches = re.finditer(pattern, filtered_text, re.IGNORECASE | re.MULTILINE)
-
-            for match in matches:
-                # Track what we detected
-                if verbose:
-                    detected_patterns.append(pattern_name)
-
-                # Apply replacement
-                if callable(replacement):
-                    # Custom replacement function
-                    filtered_text = re.sub(pattern, replacement, filtered_text, flags=re.IGNORECASE | re.MULTILINE)
-                else:
-                    # Simple string replacement
-                    filtered_text = filtered_text.replace(match.group(0), replacement)
+        for pattern_name, pattern, replacement in _COMPILED_PATTERNS:
+            if callable(replacement):
+                # Custom replacement function
+                filtered_text, count = pattern.subn(replacement, filtered_text)
+            else:
+                # Simple string replacement: every copy of a matched value is
+                # replaced, including copies the pattern would not match in place
+                found = [match.group(0) for match in pattern.finditer(filtered_text)]
+                count = len(found)
+                for value in dict.fromkeys(found):
+                    filtered_text = filtered_text.replace(value, replacement)
+
+            # Track what we detected
+            if verbose and count:
+                detected_patterns.extend([pattern_name] * count)
 
         return filtered_text, detected_patterns
 
@@ -245,8 +248,8 @@ class SensitiveInfoFilter:
         if not text or not isinstance(text, str):
             return False
 
-        for pattern_name, (pattern, _) in SensitiveInfoFilter.PATTERNS.items():
-            if re.search(pattern, text, re.IGNORECASE | re.MULTILINE):
+        for _, pattern, _ in _COMPILED_PATTERNS:
+            if pattern.search(text):
                 return True
 
         return False
@@ -264,3 +267,10 @@ class SensitiveInfoFilter:
         """
         _, detected_patterns = SensitiveInfoFilter.filter_text(text, verbose=True)
         return list(set(detected_patterns))  # Remove duplicates
+
+
+# PATTERNS compiled once, in order: [(name, compiled regex, replacement)]
+_COMPILED_PATTERNS = [
+    (pattern_name, re.compile(pattern, re.IGNORECASE | re.MULTILINE), replacement)
+    for pattern_name, (pattern, replacement) in SensitiveInfoFilter.PATTERNS.items()
+]
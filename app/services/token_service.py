@@ -31,6 +31,21 @@ class TokenService:
                 cls._tokenizer = False
         return cls._tokenizer if cls._tokenizer else None
 
+    @classmethod
+    def approximate_tokens(cls, text: str) -> int:
+        """
+        Estimate tokens from text length, without running the tokenizer.
+
+        Args:
+            text: The text to estimate tokens for
+
+        Returns:
+            Estimated number of tokens (at least 1 for non-empty text)
+        """
+        if not text:
+            return 0
+        return max(1, len(text) // cls.CHARS_PER_TOKEN)
+
     @classmethod
     def count_tokens(cls, text: str) -> int:
         """
@@ -0,0 +1,44 @@
+"""Session validation shared by blueprints that require authentication"""
+
+from flask import current_app, g, jsonify, redirect, request, session, url_for
+from flask_login import current_user, logout_user
+
+
+def validate_session_token():
+    """
+    Single session enforcement - before_request hook for protected blueprints.
+
+    Logs the user out when the session token stored in their Flask session no
+    longer matches the one in the database (another device logged in).
+    Register with ``bp.before_request(validate_session_token)``; the auth
+    blueprint must not register it, to prevent redirect loops.
+    """
+    # Skip validation for exempt endpoints (public health checks etc.)
+    if request.endpoint in current_app.config['SESSION_VALIDATION_EXEMPT']:
+        return
+
+    # Skip validation for unauthenticated users
+    if not current_user.is_authenticated:
+        return
+
+    # Get session token from Flask session
+    stored_token = session.get('session_token')
+
+    # Constant-time compare against the token already loaded with current_user
+    # (no extra query - load_user fetched the full row)
+    if not current_user.validate_session_token(stored_token):
+        # Token mismatch - another device logged in
+        # Clear the session
+        session.clear()
+        logout_user()
+
+        # Return appropriate response based on request type
+        if request.is_json or g.is_api:
+            return jsonify({
+                'error': 'Session invalidated - logged in from another device',
+                'code': 'SESSION_INVALIDATED',
+                'redirect': url_for('auth.login')
+            }), 401
+
+        # Redirect to login for regular requests
+        return redirect(url_for('auth.login'))
@@ -0,0 +1,109 @@
+"""
+Transparent compression for large text columns.
+
+Message text above a size threshold is stored as a zstd frame instead of
+plain text, so loading a long chat moves far fewer bytes out of the
+database. Values are decompressed on load, so models and routes keep
+working with plain strings.
+
+Compression only applies on SQLite, whose TEXT columns accept BLOB values
+as-is. Other databases and installs without the optional zstandard
+package keep storing plain text.
+"""
+
+import threading
+from typing import Optional
+
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Only values at least this many UTF-8 bytes long are compressed; below
+# this the frame overhead eats most of the saving
+COMPRESSION_THRESHOLD = 1024
+
+# zstd level 3 is the library default: fast, with most of the ratio
+COMPRESSION_LEVEL = 3
+
+# Every zstd frame starts with this magic number
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# zstandard compressor/decompressor objects must not be shared between
+# threads, so each thread keeps its own pair
+_local = threading.local()
+
+
+def _get_compressor():
+    compressor = getattr(_local, 'compressor', None)
+    if compressor is None:
+        compressor = _local.compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    return compressor
+
+
+def _get_decompressor():
+    decompressor = getattr(_local, 'decompressor', None)
+    if decompressor is None:
+        decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def compress_text(value: str) -> str | bytes:
+    """
+    Compress text when it is large enough to benefit.
+
+    Args:
+        value: Text to store
+
+    Returns:
+        str | bytes: zstd frame when compression helped, otherwise the original text
+    """
+    if zstandard is None:
+        return value
+
+    raw = value.encode('utf-8')
+    if len(raw) < COMPRESSION_THRESHOLD:
+        return value
+
+    compressed = _get_compressor().compress(raw)
+    return compressed if len(compressed) < len(raw) else value
+
+
+def decompress_text(value: str | bytes) -> str:
+    """
+    Return the text for a stored value, decompressing zstd frames.
+
+    Args:
+        value: Stored value (plain text or compressed bytes)
+
+    Returns:
+        str: Original text
+    """
+    if isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    if not value.startswith(ZSTD_MAGIC):
+        return value.decode('utf-8')
+    if zstandard is None:
+        raise RuntimeError("Stored message is zstd-compressed but the 'zstandard' package is not installed")
+    return _get_decompressor().decompress(value).decode('utf-8')
+
+
+class CompressedText(TypeDecorator):
+    """Text column that stores large values zstd-compressed on SQLite"""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[str | bytes]:
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return compress_text(value)
+
+    def process_result_value(self, value: Optional[str | bytes], dialect) -> Optional[str]:
+        if value is None:
+            return value
+        return decompress_text(value)
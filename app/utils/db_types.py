@@ -0,0 +1,80 @@
+"""
+Custom SQLAlchemy column types and SQL expressions.
+"""
+
+import uuid
+from typing import Optional
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime, String, TypeDecorator
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time, evaluated by the database.
+
+    Used as a column default so inserts and updates no longer build a
+    datetime in Python and send it as a bound parameter. Each dialect
+    gets an expression that returns naive UTC, matching the values
+    datetime.utcnow() wrote before.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'sqlite')
+def _utcnow_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP only has whole seconds on SQLite, which would make
+    # messages saved in the same second sort ambiguously
+    return "(STRFTIME('%Y-%m-%d %H:%M:%f', 'now'))"
+
+
+@compiles(utcnow, 'mssql')
+def _utcnow_mssql(element, compiler, **kw):
+    # GETDATE() is server local time
+    return 'GETUTCDATE()'
+
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+class BinaryUUID(TypeDecorator):
+    """
+    UUID string column stored as 16 raw bytes on SQLite.
+
+    Python code keeps using the canonical 36-character string form; on
+    SQLite the value is written as uuid.UUID.bytes, less than half the
+    size of the text form in both the row and its unique index. Other
+    databases keep the existing String(36) storage.
+
+    Rows written before the switch hold text, which lookups by the binary
+    form no longer match; scripts/migrations/convert_session_id_to_binary.py
+    rewrites them.
+    """
+
+    impl = String(36)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[str | bytes]:
+        if value is None or dialect.name != 'sqlite':
+            return value
+        try:
+            return uuid.UUID(str(value)).bytes
+        except ValueError:
+            # Not a UUID (e.g. a bad URL parameter): bind as text so the
+            # lookup simply matches nothing
+            return value
+
+    def process_result_value(self, value: Optional[str | bytes], dialect) -> Optional[str]:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return str(uuid.UUID(bytes=bytes(value)))
+        return value
@@ -0,0 +1,51 @@
+"""
+Shared HTTP sessions for calls to AI providers and local model servers.
+
+A bare requests.get()/requests.post() opens a new connection (and TLS
+handshake) every time. Sessions keep connections alive between calls, so
+repeat requests to the same provider reuse them. requests.Session is not
+guaranteed to be thread-safe, so each thread keeps its own.
+
+Sessions are shared by every user's calls on a thread, so they keep no
+cookies: a provider's Set-Cookie from one call is never sent on the next.
+"""
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection failures and gateway errors are retried twice with a short
+# backoff. urllib3 only retries statuses and read errors for idempotent
+# methods, so model API POSTs are never sent twice. raise_on_status=False
+# hands back the last error response instead of raising RetryError, so
+# callers keep seeing the same status codes as before.
+RETRY = Retry(
+    total=2,
+    backoff_factor=0.2,
+    status_forcelist=(502, 503, 504),
+    raise_on_status=False
+)
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Return this thread's HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: Session with keep-alive and retries configured
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        # Reject every cookie so nothing carries over between calls
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(max_retries=RETRY)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
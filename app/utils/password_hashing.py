@@ -0,0 +1,248 @@
+"""
+Password hashing for user accounts.
+
+New passwords are hashed with argon2id when the optional argon2-cffi
+package is installed; otherwise Werkzeug's generate_password_hash is
+used, so the app keeps working without it. Hashes from either scheme
+verify, so existing Werkzeug hashes keep working and are upgraded on
+the next successful login (see needs_rehash).
+
+The argon2 cost is read from the PASSWORD_HASH_TIME_COST,
+PASSWORD_HASH_MEMORY_COST and PASSWORD_HASH_PARALLELISM config values.
+
+Hashing is CPU-bound, so at most PASSWORD_HASH_MAX_CONCURRENCY hashes run
+at once per process. A request that cannot get a slot within
+PASSWORD_HASH_WAIT_TIMEOUT seconds raises PasswordHashingBusy (answered
+with 503) instead of queueing behind a burst of logins and starving
+every other request of CPU.
+
+Passwords longer than MAX_PASSWORD_LENGTH characters never reach the
+hasher: no stored password can be that long, so they are rejected
+outright instead of letting a request buy a full-cost hash of junk.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+# Every argon2 hash in PHC string format starts with this
+ARGON2_PREFIX = '$argon2'
+
+# Longest password accepted for hashing or verification
+MAX_PASSWORD_LENGTH = 1024
+
+# PasswordHasher per cost setting; hashers are thread-safe and reusable
+_hashers = {}
+
+# Limits concurrent hashing; created from config on first use
+_hash_slots = None
+_hash_slots_lock = threading.Lock()
+
+# Hash of a random password, verified against when a login names an
+# unknown user; created on first use
+_dummy_hash = None
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when no hashing slot frees up within the wait timeout"""
+
+
+@contextmanager
+def _hash_slot():
+    """Hold one of the PASSWORD_HASH_MAX_CONCURRENCY hashing slots"""
+    global _hash_slots
+    if _hash_slots is None:
+        with _hash_slots_lock:
+            if _hash_slots is None:
+                _hash_slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_MAX_CONCURRENCY'])
+
+    if not _hash_slots.acquire(timeout=current_app.config['PASSWORD_HASH_WAIT_TIMEOUT']):
+        raise PasswordHashingBusy()
+    try:
+        yield
+    finally:
+        _hash_slots.release()
+
+
+def _get_hasher():
+    """Return the argon2 hasher for the current app's cost settings"""
+    config = current_app.config
+    params = (
+        config['PASSWORD_HASH_TIME_COST'],
+        config['PASSWORD_HASH_MEMORY_COST'],
+        config['PASSWORD_HASH_PARALLELISM'],
+    )
+    hasher = _hashers.get(params)
+    if hasher is None:
+        time_cost, memory_cost, parallelism = params
+        hasher = _hashers[params] = argon2.PasswordHasher(
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism
+        )
+    return hasher
+
+
+def hash_password(password: str) -> str:
+    """
+    Hash a password for storage.
+
+    Args:
+        password: Plain text password
+
+    Returns:
+        str: argon2id hash, or a Werkzeug hash when argon2-cffi is not installed
+
+    Raises:
+        PasswordHashingBusy: If too many hashes are already running
+    """
+    with _hash_slot():
+        if argon2 is None:
+            return generate_password_hash(password)
+        return _get_hasher().hash(password)
+
+
+def is_acceptable_password(password: str) -> bool:
+    """
+    Cheap check that a password is worth hashing at all.
+
+    Args:
+        password: Plain text password
+
+    Returns:
+        bool: False for empty passwords and ones over MAX_PASSWORD_LENGTH
+    """
+    return bool(password) and len(password) <= MAX_PASSWORD_LENGTH
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """
+    Check a password against a stored argon2 or Werkzeug hash.
+
+    Args:
+        password_hash: Stored hash
+        password: Plain text password to check
+
+    Returns:
+        bool: True if the password matches
+
+    Raises:
+        PasswordHashingBusy: If too many hashes are already running
+    """
+    if not password_hash or not is_acceptable_password(password):
+        return False
+
+    if not password_hash.startswith(ARGON2_PREFIX):
+        with _hash_slot():
+            return check_password_hash(password_hash, password)
+
+    if argon2 is None:
+        raise RuntimeError("Password is argon2-hashed but the 'argon2-cffi' package is not installed")
+    try:
+        with _hash_slot():
+            return _get_hasher().verify(password_hash, password)
+    except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+        return False
+
+
+def verify_dummy_password(password: str) -> None:
+    """
+    Spend the same hashing time as a real verification without a stored
+    hash, so a login for an unknown username takes as long as one for an
+    existing user and cannot be used to enumerate accounts.
+
+    Args:
+        password: Plain text password from the request
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(secrets.token_urlsafe(32))
+    verify_password(_dummy_hash, password)
+
+
+# Successful verifications remembered by verify_password_cached:
+# {HMAC of (hash, password): expiry (time.monotonic())}, oldest first
+VERIFIED_CACHE_TTL = 300
+VERIFIED_CACHE_MAX_SIZE = 1024
+_verified_cache = OrderedDict()
+_verified_cache_lock = threading.Lock()
+
+
+def _verified_cache_key(password_hash: str, password: str) -> bytes:
+    """Keyed digest of a hash/password pair, so no plain password is kept in memory"""
+    key = hashlib.sha256(b'password-verify-cache:' + current_app.config['SECRET_KEY'].encode()).digest()
+    return hmac.new(key, f'{password_hash}\0{password}'.encode('utf-8'), hashlib.sha256).digest()
+
+
+def verify_password_cached(password_hash: str, password: str) -> bool:
+    """
+    verify_password, remembering successful checks for VERIFIED_CACHE_TTL
+    seconds so repeated logins with the same credentials skip the hash.
+    Failed checks are never cached, so guessing always pays the full cost.
+    The stored hash is part of the key, so a password change makes old
+    entries unreachable.
+
+    Args:
+        password_hash: Stored hash
+        password: Plain text password to check
+
+    Returns:
+        bool: True if the password matches
+    """
+    if not password_hash or not is_acceptable_password(password):
+        return False
+
+    cache_key = _verified_cache_key(password_hash, password)
+    now = time.monotonic()
+
+    with _verified_cache_lock:
+        expires_at = _verified_cache.get(cache_key)
+    if expires_at is not None and expires_at > now:
+        return True
+
+    if not verify_password(password_hash, password):
+        return False
+
+    with _verified_cache_lock:
+        _verified_cache[cache_key] = now + VERIFIED_CACHE_TTL
+        _verified_cache.move_to_end(cache_key)
+        while len(_verified_cache) > VERIFIED_CACHE_MAX_SIZE:
+            _verified_cache.popitem(last=False)
+    return True
+
+
+def clear_verified_cache():
+    """Forget all remembered successful verifications"""
+    with _verified_cache_lock:
+        _verified_cache.clear()
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """
+    Check whether a stored hash should be replaced with a fresh one.
+    True for Werkzeug hashes and for argon2 hashes made with different
+    cost settings, as long as argon2-cffi is installed.
+
+    Args:
+        password_hash: Stored hash
+
+    Returns:
+        bool: True if the password should be rehashed
+    """
+    if argon2 is None:
+        return False
+    if not password_hash.startswith(ARGON2_PREFIX):
+        return True
+    return _get_hasher().check_needs_rehash(password_hash)
@@ -3,6 +3,8 @@
 import re
 from typing import Tuple, List
 
+from app.utils.password_hashing import MAX_PASSWORD_LENGTH
+
 
 def validate_password(password: str) -> Tuple[bool, List[str]]:
     """
@@ -10,6 +12,7 @@ def validate_password(password: str) -> Tuple[bool, List[str]]:
 
     Requirements:
     - Minimum 8 characters
+    - Maximum MAX_PASSWORD_LENGTH characters
     - At least one uppercase letter
     - At least one lowercase letter
     - At least one digit
@@ -27,6 +30,10 @@ def validate_password(password: str) -> Tuple[bool, List[str]]:
     if len(password) < 8:
         errors.append("Password must be at least 8 characters long")
 
+    # Check maximum length
+    if len(password) > MAX_PASSWORD_LENGTH:
+        errors.append(f"Password must be at most {MAX_PASSWORD_LENGTH} characters long")
+
     # Check for uppercase letter
     if not re.search(r'[A-Z]', password):
         errors.append("Password must contain at least one uppercase letter")
@@ -73,7 +73,12 @@ python scripts\migrations\add_model_id_settings.py >nul 2>&1
 python scripts\migrations\add_token_tracking.py >nul 2>&1
 python scripts\migrations\add_rate_limit_settings.py >nul 2>&1
 python scripts\migrations\add_distilled_context.py >nul 2>&1
-echo    [OK] All migrations applied (including model IDs, RAG, vision, child safety, session token, token tracking, rate limits, distilled context)
+python scripts\migrations\add_message_indexes.py >nul 2>&1
+python scripts\migrations\convert_session_id_to_binary.py >nul 2>&1
+python scripts\migrations\add_password_hmac.py >nul 2>&1
+python scripts\migrations\add_backup_code_hmac.py >nul 2>&1
+python scripts\migrations\add_2fa_history_indexes.py >nul 2>&1
+echo    [OK] All migrations applied (including model IDs, RAG, vision, child safety, session token, token tracking, rate limits, distilled context, message indexes, binary session IDs, password HMAC, backup code HMAC, 2FA and password history indexes)
 
 REM Step 4: Create admin user
 echo [4/4] Creating admin user...
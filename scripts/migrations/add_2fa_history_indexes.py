@@ -0,0 +1,76 @@
+"""
+Migration script to add composite indexes for 2FA backup codes and
+password history.
+Adds (user_id, used) on twofa_backup_codes and (user_id, created_at) on
+password_history, and drops the standalone user_id indexes that the
+composite indexes now cover.
+
+Backup code checks filter a user's unused codes, and password reuse
+checks read a user's most recent history entries, so both can now be
+answered from an index range instead of filtering or sorting every row
+the user has.
+
+Usage: python scripts/migrations/add_2fa_history_indexes.py
+"""
+import os
+import sys
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from app import create_app, db
+from app.models.password_history import PasswordHistory
+from app.models.twofa_backup import TwoFABackupCode
+
+
+def get_index_names(table_name):
+    """Return the names of the indexes that exist on a table"""
+    inspector = db.inspect(db.engine)
+    return {index['name'] for index in inspector.get_indexes(table_name)}
+
+
+def replace_user_id_index(model, composite_name):
+    """Create a composite index and drop the user_id index it covers"""
+    table = model.__table__
+
+    try:
+        existing_indexes = get_index_names(table.name)
+
+        composite = next(idx for idx in table.indexes if idx.name == composite_name)
+        if composite.name not in existing_indexes:
+            composite.create(bind=db.engine)
+            print(f"  [+] Created: {composite.name}")
+        else:
+            print(f"  [=] Exists: {composite.name}")
+
+        old_name = f'ix_{table.name}_user_id'
+        if old_name in existing_indexes:
+            db.Index(old_name, table.c.user_id).drop(bind=db.engine)
+            print(f"  [-] Dropped: {old_name} (covered by composite index)")
+
+    except Exception as e:
+        print(f"  [ERROR] Error updating {table.name} indexes: {str(e)}")
+        raise
+
+
+def run_migration():
+    """Run the full migration"""
+    app = create_app('development')
+
+    with app.app_context():
+        print("\n[1/2] Adding (user_id, used) index to twofa_backup_codes table...")
+        replace_user_id_index(TwoFABackupCode, 'ix_twofa_backup_codes_user_id_used')
+
+        print("\n[2/2] Adding (user_id, created_at) index to password_history table...")
+        replace_user_id_index(PasswordHistory, 'ix_password_history_user_id_created_at')
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add 2FA and password history indexes")
+    print("=" * 60)
+    run_migration()
+    print("\n" + "=" * 60)
+    print("[OK] 2FA and password history index migration complete!")
+    print("=" * 60)
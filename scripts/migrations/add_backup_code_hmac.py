@@ -0,0 +1,103 @@
+"""
+Migration script to add the code_hmac column to 2FA backup codes.
+Adds an indexed code_hmac column and a code_hmac_key_id column to the
+twofa_backup_codes table.
+
+Backup code verification looks codes up by this HMAC, so only one
+password hash has to be checked per attempt. Existing codes are left NULL
+(the plain codes are not stored, so it cannot be filled in) and are still
+checked the old way until the user regenerates their codes.
+
+code_hmac_key_id records which SECRET_KEY an HMAC was made with, so codes
+from before a key change are checked by hash instead of never matching.
+HMACs that already exist are stamped with the current key: run this
+migration before changing SECRET_KEY.
+
+Usage: python scripts/migrations/add_backup_code_hmac.py
+"""
+import os
+import sys
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from app import create_app, db
+from app.models.twofa_backup import TwoFABackupCode
+from sqlalchemy import text, update
+
+
+def add_code_hmac_column():
+    """Add code_hmac, its index and code_hmac_key_id to twofa_backup_codes"""
+    inspector = db.inspect(db.engine)
+    existing_columns = [col['name'] for col in inspector.get_columns('twofa_backup_codes')]
+
+    print("\n[1/4] Adding code_hmac column to twofa_backup_codes table...")
+    if 'code_hmac' in existing_columns:
+        print("  [=] twofa_backup_codes.code_hmac already exists, skipping...")
+    else:
+        if db.engine.dialect.name == 'mssql':
+            db.session.execute(text('ALTER TABLE twofa_backup_codes ADD code_hmac VARBINARY(32) NULL'))
+        else:
+            db.session.execute(text('ALTER TABLE twofa_backup_codes ADD COLUMN code_hmac BLOB'))
+        db.session.commit()
+        print("  [+] twofa_backup_codes.code_hmac column added!")
+
+    print("\n[2/4] Adding code_hmac index...")
+    existing_indexes = {index['name'] for index in inspector.get_indexes('twofa_backup_codes')}
+    index = next(
+        idx for idx in TwoFABackupCode.__table__.indexes
+        if [col.name for col in idx.columns] == ['code_hmac']
+    )
+    if index.name not in existing_indexes:
+        index.create(bind=db.engine)
+        print(f"  [+] Created: {index.name}")
+    else:
+        print(f"  [=] Exists: {index.name}")
+
+    print("\n[3/4] Adding code_hmac_key_id column to twofa_backup_codes table...")
+    if 'code_hmac_key_id' in existing_columns:
+        print("  [=] twofa_backup_codes.code_hmac_key_id already exists, skipping...")
+    else:
+        if db.engine.dialect.name == 'mssql':
+            db.session.execute(text('ALTER TABLE twofa_backup_codes ADD code_hmac_key_id VARBINARY(8) NULL'))
+        else:
+            db.session.execute(text('ALTER TABLE twofa_backup_codes ADD COLUMN code_hmac_key_id BLOB'))
+        db.session.commit()
+        print("  [+] twofa_backup_codes.code_hmac_key_id column added!")
+
+    print("\n[4/4] Stamping existing HMACs with the current key...")
+    result = db.session.execute(
+        update(TwoFABackupCode)
+        .where(
+            TwoFABackupCode.code_hmac.is_not(None),
+            TwoFABackupCode.code_hmac_key_id.is_(None)
+        )
+        .values(code_hmac_key_id=TwoFABackupCode.hmac_key_id())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    print(f"  [+] {result.rowcount} code(s) stamped with the current key")
+
+
+def run_migration():
+    """Run the full migration"""
+    app = create_app('development')
+
+    with app.app_context():
+        try:
+            add_code_hmac_column()
+        except Exception as e:
+            db.session.rollback()
+            print(f"  [ERROR] Error during migration: {str(e)}")
+            raise
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add 2FA backup code HMAC column")
+    print("=" * 60)
+    run_migration()
+    print("\n" + "=" * 60)
+    print("[OK] Backup code HMAC migration complete!")
+    print("=" * 60)
@@ -0,0 +1,96 @@
+"""
+Migration script to add message lookup indexes.
+Adds a composite (chat_id, created_at) index on messages and an index on
+attachments.message_id, and drops the standalone messages.chat_id index
+that the composite index now covers.
+
+Loading a chat's history filters by chat_id and orders by created_at, so the
+composite index lets the database read the rows already in order instead of
+sorting them. SQLite does not index foreign keys automatically, so attachment
+lookups by message_id also get their own index.
+
+Usage: python scripts/migrations/add_message_indexes.py
+"""
+import os
+import sys
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from app import create_app, db
+from app.models.attachment import Attachment
+from app.models.chat import Message
+
+
+def get_index_names(table_name):
+    """Return the names of the indexes that exist on a table"""
+    inspector = db.inspect(db.engine)
+    return {index['name'] for index in inspector.get_indexes(table_name)}
+
+
+def add_message_indexes():
+    """Add composite index on messages and drop the redundant chat_id index"""
+    print("\n[1/2] Adding (chat_id, created_at) index to messages table...")
+
+    try:
+        existing_indexes = get_index_names('messages')
+
+        composite = next(
+            idx for idx in Message.__table__.indexes
+            if idx.name == 'ix_messages_chat_id_created_at'
+        )
+        if composite.name not in existing_indexes:
+            composite.create(bind=db.engine)
+            print(f"  [+] Created: {composite.name}")
+        else:
+            print(f"  [=] Exists: {composite.name}")
+
+        if 'ix_messages_chat_id' in existing_indexes:
+            db.Index('ix_messages_chat_id', Message.__table__.c.chat_id).drop(bind=db.engine)
+            print("  [-] Dropped: ix_messages_chat_id (covered by composite index)")
+
+    except Exception as e:
+        print(f"  [ERROR] Error updating messages indexes: {str(e)}")
+        raise
+
+
+def add_attachment_index():
+    """Add index on attachments.message_id"""
+    print("\n[2/2] Adding message_id index to attachments table...")
+
+    try:
+        existing_indexes = get_index_names('attachments')
+
+        index = next(
+            idx for idx in Attachment.__table__.indexes
+            if [col.name for col in idx.columns] == ['message_id']
+        )
+        if index.name not in existing_indexes:
+            index.create(bind=db.engine)
+            print(f"  [+] Created: {index.name}")
+        else:
+            print(f"  [=] Exists: {index.name}")
+
+    except Exception as e:
+        print(f"  [ERROR] Error updating attachments indexes: {str(e)}")
+        raise
+
+
+def run_migration():
+    """Run the full migration"""
+    app = create_app('development')
+
+    with app.app_context():
+        add_message_indexes()
+        add_attachment_index()
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add message lookup indexes")
+    print("=" * 60)
+    run_migration()
+    print("\n" + "=" * 60)
+    print("[OK] Message index migration complete!")
+    print("=" * 60)
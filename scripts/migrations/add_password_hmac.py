@@ -0,0 +1,90 @@
+"""
+Migration script to add password_hmac columns.
+Adds password_hmac and password_hmac_key_id to the users and
+password_history tables.
+
+The HMAC lets password reuse checks skip the slow password hash for
+history entries that cannot match. Existing rows are left NULL and are
+checked the old way; new values are filled in as passwords change.
+
+password_hmac_key_id records which SECRET_KEY an HMAC was made with, so
+entries from before a key change fall back to the hash check. HMACs that
+already exist are stamped with the current key: run this migration before
+changing SECRET_KEY.
+
+Usage: python scripts/migrations/add_password_hmac.py
+"""
+import os
+import sys
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from app import create_app, db
+from app.models.password_history import PasswordHistory
+from sqlalchemy import text
+
+
+def add_column(table_name, column_name, size):
+    """Add a nullable binary column to a table"""
+    inspector = db.inspect(db.engine)
+    existing_columns = [col['name'] for col in inspector.get_columns(table_name)]
+
+    if column_name in existing_columns:
+        print(f"  [=] {table_name}.{column_name} already exists, skipping...")
+        return
+
+    if db.engine.dialect.name == 'mssql':
+        db.session.execute(text(f'ALTER TABLE {table_name} ADD {column_name} VARBINARY({size}) NULL'))
+    else:
+        db.session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} BLOB'))
+    db.session.commit()
+    print(f"  [+] {table_name}.{column_name} column added!")
+
+
+def stamp_key_id(table_name):
+    """Mark existing HMACs as made with the current SECRET_KEY"""
+    result = db.session.execute(
+        text(
+            f'UPDATE {table_name} SET password_hmac_key_id = :key_id '
+            'WHERE password_hmac IS NOT NULL AND password_hmac_key_id IS NULL'
+        ),
+        {'key_id': PasswordHistory.hmac_key_id()}
+    )
+    db.session.commit()
+    print(f"  [+] {table_name}: {result.rowcount} HMAC(s) stamped with the current key")
+
+
+def run_migration():
+    """Run the full migration"""
+    app = create_app('development')
+
+    with app.app_context():
+        try:
+            print("\n[1/3] Adding password_hmac columns to users table...")
+            add_column('users', 'password_hmac', 32)
+            add_column('users', 'password_hmac_key_id', 8)
+
+            print("\n[2/3] Adding password_hmac columns to password_history table...")
+            add_column('password_history', 'password_hmac', 32)
+            add_column('password_history', 'password_hmac_key_id', 8)
+
+            print("\n[3/3] Stamping existing HMACs with the current key...")
+            stamp_key_id('users')
+            stamp_key_id('password_history')
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"  [ERROR] Error during migration: {str(e)}")
+            raise
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add password_hmac columns")
+    print("=" * 60)
+    run_migration()
+    print("\n" + "=" * 60)
+    print("[OK] Password HMAC migration complete!")
+    print("=" * 60)
@@ -0,0 +1,78 @@
+"""
+Migration script to store chat session IDs as 16-byte binary UUIDs.
+Rewrites text session_id values in the chats table into their raw
+16-byte form, which Chat.session_id now reads and writes on SQLite.
+
+Only SQLite databases are converted; other databases keep String(36)
+session IDs and need no changes.
+
+Usage: python scripts/migrations/convert_session_id_to_binary.py
+"""
+import os
+import sys
+import uuid
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from app import create_app, db
+from sqlalchemy import text
+
+
+def convert_session_ids():
+    """Convert text session IDs to binary UUIDs"""
+    print("\n[1/1] Converting chat session IDs to binary UUIDs...")
+
+    if db.engine.dialect.name != 'sqlite':
+        print(f"  [=] {db.engine.dialect.name} keeps text session IDs, skipping...")
+        return
+
+    try:
+        # Raw SQL so the values are read exactly as stored
+        rows = db.session.execute(
+            text("SELECT id, session_id FROM chats WHERE typeof(session_id) = 'text'")
+        ).all()
+
+        converted_count = 0
+        skipped_count = 0
+
+        for chat_id, session_id in rows:
+            try:
+                binary_id = uuid.UUID(session_id).bytes
+            except ValueError:
+                print(f"  [!] Chat {chat_id} has a non-UUID session_id, leaving as text")
+                skipped_count += 1
+                continue
+
+            db.session.execute(
+                text("UPDATE chats SET session_id = :session_id WHERE id = :id"),
+                {'session_id': binary_id, 'id': chat_id}
+            )
+            converted_count += 1
+
+        db.session.commit()
+        print(f"     Converted: {converted_count}, Skipped: {skipped_count}")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"  [ERROR] Error converting session IDs: {str(e)}")
+        raise
+
+
+def run_migration():
+    """Run the full migration"""
+    app = create_app('development')
+
+    with app.app_context():
+        convert_session_ids()
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Convert chat session IDs to binary UUIDs")
+    print("=" * 60)
+    run_migration()
+    print("\n" + "=" * 60)
+    print("[OK] Session ID migration complete!")
+    print("=" * 60)
@@ -63,7 +63,7 @@ def remove_anonymous_chats():
                 print(f"Processing chat: {chat.name} (session_id: {chat.session_id})")
 
                 # Get all messages in the chat
-                messages = chat.messages.all()
+                messages = chat.messages
                 deleted_messages += len(messages)
 
                 # Delete attachment files
@@ -19,7 +19,8 @@ from app import create_app, db
 from app.models.rbac import Role, Permission
 from app.models.user import User
 # Import all models to ensure they're registered with SQLAlchemy
-from app.models import *  # noqa
+from app.models import import_all_models
+import_all_models()
 
 
 def init_database():
@@ -84,7 +84,7 @@ def test_admin_user_management():
         print("[PASS] Test data created successfully")
         print(f"  - Super admin: {admin_user.username}")
         print(f"  - Regular user 1: {regular_user.username}")
-        print(f"  - Regular user 2: {test_user2.username} (with {chat.messages.count()} messages)")
+        print(f"  - Regular user 2: {test_user2.username} (with {len(chat.messages)} messages)")
 
         # Test 1: Check if super admin can access user list
         with app.test_client() as client: